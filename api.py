@@ -0,0 +1,169 @@
+"""
+Async HTTP service for the mentor bot.
+
+Run with:  uvicorn api:app --host 0.0.0.0 --port 8000
+
+Chat responses are streamed as server-sent events, one `data:` line per
+token batch, followed by an `event: done` message. Uploads are ingested in
+the background; poll /sessions/{id}/uploads/{job} for progress.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from chat_responses import LMMentorBot
+from ingestion_jobs import IngestionJob
+from streaming import StreamStats
+
+MAX_TRACKED_UPLOADS = 32
+
+class ChatRequest(BaseModel):
+    message: str
+    stream: bool = True
+
+
+class UploadedBytes:
+    """Minimal stand-in for a Streamlit UploadedFile, as FileParser expects"""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self._data = data
+
+    def getvalue(self) -> bytes:
+        return self._data
+
+
+class Session:
+    def __init__(self, bot: LMMentorBot):
+        self.bot = bot
+        # One in-flight request per session keeps its history consistent
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+        self.uploads: Dict[int, IngestionJob] = {}
+
+
+class SessionManager:
+    """Per-session bots, evicting the least recently used beyond max_sessions"""
+
+    def __init__(self, bot_factory: Callable[[], LMMentorBot], max_sessions: int = 1000):
+        self.bot_factory = bot_factory
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(self.bot_factory())
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if oldest.lock.locked():
+                    break
+                del self._sessions[oldest_id]
+        self._sessions.move_to_end(session_id)
+        session.last_seen = time.monotonic()
+        return session
+
+    def drop(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def create_app(
+    bot_factory: Callable[[], LMMentorBot] = LMMentorBot,
+    max_concurrent_requests: int = 256,
+    max_sessions: int = 1000,
+) -> FastAPI:
+    """Build the app; tests pass a factory that injects a fake LLM"""
+    app = FastAPI(title="Conmodus API")
+    sessions = SessionManager(bot_factory, max_sessions=max_sessions)
+    # Caps model calls in flight across all sessions in this process
+    limiter = asyncio.Semaphore(max_concurrent_requests)
+    app.state.sessions = sessions
+
+    @app.post("/sessions/{session_id}/chat")
+    async def chat(session_id: str, request: ChatRequest):
+        session = sessions.get(session_id)
+
+        # The session lock first: requests queued behind their own session
+        # mustn't hold global slots while they wait
+        if not request.stream:
+            async with session.lock, limiter:
+                answer = await session.bot.achat(request.message, session_id=session_id)
+            return {"answer": answer}
+
+        async def events():
+            async with session.lock, limiter:
+                # Measured at the SSE layer, i.e. as seen by the client
+                stats = StreamStats()
+                try:
+                    async for text in session.bot.astream(request.message, session_id=session_id):
+                        stats.record(text)
+                        yield _sse({"token": text})
+                except Exception as e:
+                    yield _sse({"error": f"Error processing message: {str(e)}"}, event="error")
+                    return
+                details = stats.finish().as_dict()
+                yield _sse({
+                    "time_to_first_token": details["time_to_first_token"],
+                    "tokens_per_second": details["tokens_per_second"],
+                    "total_seconds": details["total_seconds"],
+                }, event="done")
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.post("/sessions/{session_id}/upload")
+    async def upload(session_id: str, file: UploadFile = File(...)):
+        if not file.filename:
+            raise HTTPException(status_code=400, detail="No file uploaded.")
+        session = sessions.get(session_id)
+        data = await file.read()
+        # Ingested in the background; chat on this session carries on meanwhile
+        job = session.bot.start_upload(UploadedBytes(file.filename, data))
+        session.uploads[job.id] = job
+        # Finished jobs stay pollable until the session has many newer ones
+        finished = [job_id for job_id, j in session.uploads.items() if j.finished]
+        for job_id in finished[:max(0, len(session.uploads) - MAX_TRACKED_UPLOADS)]:
+            del session.uploads[job_id]
+        return {"message": f"Processing {file.filename}...", "job": job.progress()}
+
+    @app.get("/sessions/{session_id}/uploads/{job_id}")
+    async def upload_progress(session_id: str, job_id: int):
+        job = sessions.get(session_id).uploads.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown upload.")
+        return job.progress()
+
+    @app.post("/sessions/{session_id}/reset")
+    async def reset(session_id: str):
+        session = sessions.get(session_id)
+        async with session.lock:
+            await asyncio.to_thread(session.bot.reset, session_id)
+        sessions.drop(session_id)
+        return {"message": "Session reset."}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "sessions": len(sessions)}
+
+    return app
+
+
+app = create_app()
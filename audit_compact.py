@@ -0,0 +1,195 @@
+"""
+Deterministic dense rendering of a parsed degree audit.
+
+Produces the format audit_summary_prompt.txt asks an LLM for: student
+details first, then one line per requirement with the credits used and
+the courses fulfilling it, then the in-progress courses. No model call
+is needed, so the result is identical for the same audit and takes
+milliseconds.
+
+The result is checked against the raw audit text; if any course code or
+requirement line would be lost, the raw text is used instead.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from audit_parse import NEEDED, REQUIREMENT_LINE, Course, DegreeAudit, InvalidAuditError, Requirement, parse_audit
+from history_window import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+
+# Labels written for each student header field, in output order
+STUDENT_LABELS = (
+    ("name", "Name"),
+    ("gpa", "GPA"),
+    ("expected_graduation", "Grad"),
+    ("ctp", "CTP"),
+    ("in_progress_units", "IP units"),
+)
+
+COURSE_CODE = re.compile(r"\b([A-Z][A-Z&]{1,7})\s+(\d{3}[A-Z]?)\b")
+# Lines stating a requirement or what is still needed, in any layout
+REQUIREMENT_HINT = re.compile(r"\b(?:needed|required|requirements?)\b", re.IGNORECASE)
+TOKEN = re.compile(r"[A-Za-z][A-Za-z&']+|\d+(?:\.\d+)?")
+# Words the compact form replaces with its own status and unit notation
+FILLER = {
+    "satisfied", "not", "in", "progress", "ok", "no", "ip", "needed", "required",
+    "credit", "credits", "unit", "units", "course", "courses", "the", "of", "and", "a", "an", "to",
+}
+
+
+class CompactAudit:
+    __slots__ = ("text", "tokens_before", "tokens_after", "seconds", "missing")
+
+    def __init__(self, text: str, tokens_before: int, tokens_after: int, seconds: float,
+                 missing: Optional[List[str]] = None):
+        self.text = text
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.seconds = seconds
+        # What the compact form would have dropped, if it was abandoned for the raw text
+        self.missing = missing or []
+
+    def as_dict(self) -> Dict:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "ms": self.seconds * 1000,
+            "missing": self.missing,
+        }
+
+
+def _credits(value: float) -> str:
+    return f"{value:g}"
+
+
+def _course(course: Course) -> str:
+    grade = "IP" if course.in_progress else (course.grade or "T")
+    return f"{course.code} {_credits(course.credits)}cr {grade}"
+
+
+def _status(requirement: Requirement) -> str:
+    if requirement.status == "satisfied":
+        return "DONE"
+    # An in-progress course counts toward the requirement, so it isn't incomplete
+    if any(course.in_progress for course in requirement.courses):
+        return "IP"
+    return "PARTIAL" if requirement.courses else "INCOMPLETE"
+
+
+def _requirement(requirement: Requirement) -> str:
+    used = sum(course.credits for course in requirement.courses)
+    needed = f", need {requirement.needed}" if requirement.needed else ""
+    courses = "; ".join(_course(course) for course in requirement.courses) or "-"
+    return f"[{_status(requirement)}] {requirement.name} ({_credits(used)}cr used{needed}): {courses}"
+
+
+def compact_audit(audit: DegreeAudit) -> str:
+    """Dense plain-text report of an audit, one requirement per line"""
+    if not audit.recognized:
+        return audit.text
+    lines: List[str] = []
+    student = [f"{label}: {audit.student[field]}" for field, label in STUDENT_LABELS if field in audit.student]
+    if student:
+        lines.append(" | ".join(student))
+
+    if audit.unassigned_courses:
+        lines.append("Other courses: " + "; ".join(_course(course) for course in audit.unassigned_courses))
+    lines.extend(_requirement(requirement) for requirement in audit.requirements)
+
+    # A course can count toward several requirements; list it once
+    in_progress: Dict[str, Course] = {}
+    for course in audit.courses():
+        if course.in_progress:
+            in_progress.setdefault(course.code, course)
+    if in_progress:
+        lines.append(
+            "In progress: " + ", ".join(f"{c.code} ({_credits(c.credits)}cr)" for c in in_progress.values())
+        )
+    return "\n".join(lines)
+
+
+def compact_checked(audit: DegreeAudit, started: Optional[float] = None) -> CompactAudit:
+    """Compact a parsed audit, keeping its raw text if the compact form would drop anything"""
+    started = time.monotonic() if started is None else started
+    text = compact_audit(audit)
+    missing = check_fidelity(audit.text, text)
+    if missing:
+        logger.warning("Compact audit would drop %s; using the full text", ", ".join(missing[:5]))
+        text = audit.text
+    return CompactAudit(
+        text,
+        tokens_before=estimate_tokens(audit.text),
+        tokens_after=estimate_tokens(text),
+        seconds=time.monotonic() - started,
+        missing=missing,
+    )
+
+
+def compact_audit_file(source) -> CompactAudit:
+    """Parse an audit PDF and compact it, reporting token counts before and after"""
+    started = time.monotonic()
+    return compact_checked(parse_audit(source), started)
+
+
+def _tokens(text: str) -> set:
+    return {token.lower() for token in TOKEN.findall(text)}
+
+
+def check_fidelity(source_text: str, text: str) -> List[str]:
+    """
+    Course codes and requirement lines of the raw audit text missing from
+    its compact form; empty when nothing was lost.
+
+    Works from the text rather than the parsed records, so lines the parser
+    did not understand count as lost too.
+    """
+    flat = " ".join(text.split())
+    words = _tokens(text)
+    missing: List[str] = []
+    for code in dict.fromkeys(" ".join(match.groups()) for match in COURSE_CODE.finditer(source_text)):
+        if code not in flat:
+            missing.append(code)
+    for line in source_text.splitlines():
+        if COURSE_CODE.search(line) or not (
+            REQUIREMENT_LINE.match(line) or NEEDED.search(line) or REQUIREMENT_HINT.search(line)
+        ):
+            continue
+        if not _tokens(line) - FILLER <= words:
+            missing.append(" ".join(line.split()))
+    return missing
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Compact every audit PDF in a directory and check nothing was dropped"""
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python audit_compact.py AUDIT_DIRECTORY", file=sys.stderr)
+        return 2
+
+    failures = 0
+    for name in sorted(os.listdir(argv[0])):
+        if not name.lower().endswith(".pdf"):
+            continue
+        path = os.path.join(argv[0], name)
+        try:
+            result = compact_audit_file(path)
+        except InvalidAuditError:
+            print(f"{name}: not a degree audit, skipped")
+            continue
+        failures += bool(result.missing)
+        print(
+            f"{name}: {result.tokens_before} -> {result.tokens_after} tokens "
+            f"in {result.seconds * 1000:.1f}ms" + (f", fell back to full text, MISSING {result.missing}" if result.missing else "")
+        )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,43 +1,322 @@
-from langchain_community.document_loaders import PyPDFLoader
-from pypdf import PdfReader
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
 
+from pdf_pages import iter_page_text, pdf_bytes
 
-def extract_text_fromaudit(uploaded_file)->str:
-    """
-    Extract text from uploaded degree audit
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidAuditError(ValueError):
+    pass
+
+
+# "Satisfied: Upper Level Writing" / "NO   Major Electives - 7 credits needed"
+REQUIREMENT_LINE = re.compile(
+    r"^\s*(?:(?P<status>Not Satisfied|Satisfied|In Progress)\s*:|(?P<flag>(?-i:OK|NO|IP))\s{2,})"
+    r"\s*(?P<name>\S.*?)\s*$",
+    re.IGNORECASE,
+)
+# Status flags some audit exports print in front of a requirement
+STATUS_FLAGS = {"OK": "satisfied", "NO": "not satisfied", "IP": "in progress"}
+# "FA 2023  EECS 281  Data Struc & Algorithms  4.00  A-"
+COURSE_LINE = re.compile(
+    r"^\s*(?P<term>(?:FA|WN|SP|SU|SS|Fall|Winter|Spring|Summer)\s+\d{4})\s+"
+    r"(?P<subject>[A-Z][A-Z&]{1,7})\s+(?P<number>\d{3}[A-Z]?)\s+"
+    r"(?P<title>.*?)\s+(?P<credits>\d{1,2}\.\d{1,2})"
+    r"(?:\s+(?P<grade>[A-E][+-]?|P|F|S|U|W|I|Y|T|CR|NC|IP)(?=\s|\*|$))?(?P<rest>.*)$"
+)
+# Student details from the audit header, e.g. "Cumulative GPA: 3.512"
+HEADER_FIELDS = {
+    "name": re.compile(r"\b(?:Student )?Name\s*:\s*(\S.*?)(?:\s{2,}|$)", re.IGNORECASE),
+    "gpa": re.compile(r"\b(?:Cumulative )?GPA\s*:?\s*(\d\.\d+)", re.IGNORECASE),
+    "expected_graduation": re.compile(
+        r"\bExpected Grad(?:uation)?(?: Term| Sem(?:ester)?)?\s*:\s*(\S.*?)(?:\s{2,}|$)", re.IGNORECASE
+    ),
+    "ctp": re.compile(r"\b(?:Credits? Toward(?:s)? Program|CTP)\s*:?\s*(\d+(?:\.\d+)?)", re.IGNORECASE),
+    "in_progress_units": re.compile(r"\bIn Progress (?:Units|Credits)\s*:?\s*(\d+(?:\.\d+)?)", re.IGNORECASE),
+}
+# "Needed: 7.00 credits" / "3 courses needed"
+NEEDED = re.compile(
+    r"(?:Needed\s*:\s*(\d+(?:\.\d+)?)\s*(credits?|units?|courses?))|"
+    r"(?:(\d+(?:\.\d+)?)\s*(credits?|units?|courses?)\s+(?:needed|required))",
+    re.IGNORECASE,
+)
+
+
+class Course:
+    __slots__ = ("term", "subject", "number", "title", "credits", "grade", "in_progress")
+
+    def __init__(self, term: str, subject: str, number: str, title: str,
+                 credits: float, grade: Optional[str], in_progress: bool):
+        self.term = term
+        self.subject = subject
+        self.number = number
+        self.title = title
+        self.credits = credits
+        self.grade = grade
+        self.in_progress = in_progress
+
+    @property
+    def code(self) -> str:
+        return f"{self.subject} {self.number}"
+
+    def as_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Requirement:
+    __slots__ = ("name", "status", "needed", "courses")
+
+    def __init__(self, name: str, status: str):
+        self.name = name
+        self.status = status
+        # e.g. "7 credits", when the audit states what is still needed
+        self.needed: Optional[str] = None
+        self.courses: List[Course] = []
+
+    def as_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "needed": self.needed,
+            "courses": [course.as_dict() for course in self.courses],
+        }
+
+
+class DegreeAudit:
+    """Requirements of a parsed degree audit, each with the courses listed under it"""
+
+    __slots__ = ("key", "student", "requirements", "unassigned_courses", "text")
+
+    def __init__(self, key: str):
+        self.key = key
+        # Header details: name, gpa, expected_graduation, ctp, in_progress_units
+        self.student: Dict[str, str] = {}
+        self.requirements: List[Requirement] = []
+        # Courses listed before the first requirement heading
+        self.unassigned_courses: List[Course] = []
+        # The cleaned audit text the records were parsed from
+        self.text = ""
+
+    @property
+    def recognized(self) -> bool:
+        """Whether any requirement or course lines were understood"""
+        return bool(self.requirements or self.unassigned_courses)
+
+    def courses(self) -> Iterator[Course]:
+        yield from self.unassigned_courses
+        for requirement in self.requirements:
+            yield from requirement.courses
+
+    def as_dict(self) -> Dict:
+        result = {
+            "key": self.key,
+            "student": self.student,
+            "requirements": [requirement.as_dict() for requirement in self.requirements],
+            "unassigned_courses": [course.as_dict() for course in self.unassigned_courses],
+        }
+        if not self.recognized:
+            # Unfamiliar layout: hand over the text rather than empty records
+            result["text"] = self.text
+        return result
+
+
+def _iter_audit_pages(data: bytes, workers: Optional[int] = None) -> Iterator[str]:
     """
-    audit_text = []
-    # Load PDF
-    reader = PdfReader(uploaded_file)
-    for page in reader.pages:
-        audit_text.append(page.extract_text(extraction_mode='layout'))
+    Yield the cleaned text of each audit page.
 
+    Page 1 is extracted and checked on its own first, so a PDF that is not
+    a degree audit is rejected without extracting the rest of it.
+    """
+    first = next(iter_page_text(data, workers=1), "")
     # check if valid degree audit
-    if len(audit_text[0]) < 2:
-        return "Invalid PDF"
-    
-    if audit_text[0].find("Degree Audit") == -1:
-        return "Invalid PDF"
-    # remove header from pages 1 to end
-    for i in range(1, len(audit_text)):
-        # replace * with [IN PROGRESS]
-        start = audit_text[i].find("- In Progress")
+    if len(first) < 2 or first.find("Degree Audit") == -1:
+        raise InvalidAuditError("Invalid PDF")
+
+    # One page of look-ahead, so the last page can be trimmed
+    previous = first
+    for text in iter_page_text(data, workers=workers, start=1):
+        yield previous
+        # remove header from pages 2 to end
+        start = text.find("- In Progress")
         if start != -1:
-            audit_text[i] = audit_text[i][start + 13:]
+            text = text[start + 13:]
         else:
-            start = audit_text[i].find(" In Progress")
+            start = text.find(" In Progress")
             if start != -1:
-                audit_text[i] = audit_text[i][start + 32:]
-        # remove last page after Course History
-    end = audit_text[-1].find("Course History")
+                text = text[start + 32:]
+        previous = text
+
+    # remove last page after Course History
+    end = previous.find("Course History")
     if end != -1:
-        audit_text[-1] = audit_text[-1][:end]
+        previous = previous[:end]
+    yield previous
+
+
+def extract_text_fromaudit(uploaded_file)->str:
+    """
+    Extract text from uploaded degree audit
+    """
+    try:
+        pages = list(_iter_audit_pages(pdf_bytes(uploaded_file)))
+    except InvalidAuditError:
+        return "Invalid PDF"
+
+    # concatenate all pages, marking in-progress courses
+    return "".join(pages).replace("*", "[IN PROGRESS]")
+
+
+def _parse_course(match: re.Match, line: str) -> Course:
+    grade = match.group("grade")
+    in_progress = "*" in line or grade == "IP" or "in progress" in match.group("rest").lower()
+    return Course(
+        term=match.group("term"),
+        subject=match.group("subject"),
+        number=match.group("number"),
+        title=" ".join(match.group("title").split()),
+        credits=float(match.group("credits")),
+        grade=None if grade == "IP" else grade,
+        in_progress=in_progress,
+    )
+
+
+def _requirement(match: re.Match) -> Requirement:
+    status = match.group("status")
+    status = status.lower() if status else STATUS_FLAGS[match.group("flag")]
+    name = " ".join(match.group("name").split())
+    requirement = Requirement(name, status)
+    # "Major Electives - 7 credits needed": keep the amount out of the name
+    needed = NEEDED.search(name)
+    if needed and needed.start() > 0:
+        requirement.name = name[:needed.start()].rstrip(" -:,")
+        amount, unit = (needed.group(1), needed.group(2)) if needed.group(1) else (needed.group(3), needed.group(4))
+        requirement.needed = f"{amount} {unit.lower()}"
+    return requirement
+
+
+def parse_audit_pages(pages: Iterator[str], key: str = "") -> DegreeAudit:
+    """
+    Build requirement and course records from cleaned audit pages, line by line.
+
+    The cleaned text is kept on the result; when none of its lines match a
+    known requirement or course layout, audit.recognized is False and
+    callers should fall back to the text.
+    """
+    audit = DegreeAudit(key)
+    current: Optional[Requirement] = None
+    texts: List[str] = []
+    for page in pages:
+        texts.append(page)
+        for line in page.splitlines():
+            match = COURSE_LINE.match(line)
+            if match:
+                course = _parse_course(match, line)
+                (current.courses if current else audit.unassigned_courses).append(course)
+                continue
+            match = REQUIREMENT_LINE.match(line)
+            if match:
+                current = _requirement(match)
+                audit.requirements.append(current)
+                continue
+            match = NEEDED.search(line)
+            if match and current is not None and current.needed is None:
+                amount, unit = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+                current.needed = f"{amount} {unit.lower()}"
+                continue
+            if current is None:
+                for field, pattern in HEADER_FIELDS.items():
+                    if field not in audit.student:
+                        match = pattern.search(line)
+                        if match:
+                            audit.student[field] = match.group(1).strip()
+    audit.text = "".join(texts)
+    if not audit.recognized:
+        logger.warning("No requirement or course lines recognized in audit %s; falling back to its text", key[:12])
+    return audit
+
+
+_cache: "OrderedDict[str, DegreeAudit]" = OrderedDict()
+_cache_lock = threading.Lock()
+MAX_CACHED_AUDITS = 256
+
+
+def parse_audit(source, workers: Optional[int] = None) -> DegreeAudit:
+    """
+    Parse a degree audit PDF into structured records.
+
+    Results are cached by the hash of the PDF, so the same audit uploaded
+    again is not extracted twice. Raises InvalidAuditError for PDFs that
+    are not degree audits.
+    """
+    data = pdf_bytes(source)
+    key = hashlib.sha256(data).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    audit = parse_audit_pages(_iter_audit_pages(data, workers), key)
+    with _cache_lock:
+        _cache[key] = audit
+        while len(_cache) > MAX_CACHED_AUDITS:
+            _cache.popitem(last=False)
+    return audit
+
+
+def _parse_path(path: str) -> Dict:
+    # Pages are extracted serially: the batch already runs one audit per process
+    try:
+        return {"file": path, "audit": parse_audit(path, workers=1).as_dict()}
+    except Exception as e:
+        return {"file": path, "error": str(e)}
+
+
+def parse_audit_directory(directory: str, workers: Optional[int] = None) -> Iterator[Dict]:
+    """Parse every PDF in a directory across a process pool, yielding one result per file"""
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(".pdf")
+    )
+    if not paths:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_parse_path, paths, chunksize=4)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parse a directory of degree audit PDFs into JSON lines")
+    parser.add_argument("directory")
+    parser.add_argument("--output", "-o", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
 
-        # concatenate all pages
-    concat_text = ""
-    for i in range(len(audit_text)):
-        concat_text += audit_text[i]
+    out = open(args.output, "w") if args.output else sys.stdout
+    parsed = failed = 0
+    try:
+        for result in parse_audit_directory(args.directory, args.workers):
+            out.write(json.dumps(result) + "\n")
+            if "error" in result:
+                failed += 1
+            else:
+                parsed += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Parsed {parsed} audits, {failed} failed", file=sys.stderr)
+    return 0 if parsed or not failed else 1
 
-    concat_text = concat_text.replace("*", "[IN PROGRESS]")
 
-    return concat_text
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: per-rerun transcript cost for a long chat session.
+
+Compares the old dashboard loop (parse every assistant message on every
+rerun, draw them all) with the windowed Transcript (options parsed once at
+append time, only the newest page drawn). Drawing is counted rather than
+done, since Streamlit isn't running.
+
+    python benchmarks/bench_transcript.py [--messages 500] [--reruns 200]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript import Transcript  # noqa: E402
+
+
+ASSISTANT_REPLY = (
+    "Good question! A hash table maps keys to buckets using a hash function, "
+    "so lookups take constant time on average. " * 6
+    + "\n[OPTIONS]\nA) Linear probing\nB) Separate chaining\nC) Quadratic probing\nD) Double hashing\n[/OPTIONS]"
+)
+
+
+def legacy_parse_options(text):
+    # The dashboard's previous implementation, regexes compiled on every call
+    pattern = r'\[OPTIONS\](.*?)\[/OPTIONS\]'
+    matches = list(re.finditer(pattern, text, re.DOTALL | re.IGNORECASE))
+    if matches:
+        options_text = matches[-1].group(1).strip()
+        options = re.findall(r'([A-D])\)\s*([^A-D]+?)(?=(?:\s*[A-D]\)|$))', options_text, re.DOTALL)
+        options = [(letter, option.strip()) for letter, option in options]
+        return re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE).strip(), options
+    return text, []
+
+
+def legacy_rerun(messages, draw):
+    for idx, message in enumerate(messages):
+        if message["role"] == "assistant":
+            text, options = legacy_parse_options(message["content"])
+            draw(text)
+            if idx == len(messages) - 1:
+                for option in options:
+                    draw(option)
+        else:
+            draw(message["content"])
+
+
+def windowed_rerun(transcript, draw):
+    last_idx = len(transcript) - 1
+    for idx, message in transcript.window():
+        draw(message.text)
+        if message.role == "assistant" and idx == last_idx:
+            for option in message.options:
+                draw(option)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--reruns", type=int, default=200)
+    args = parser.parse_args()
+
+    messages = []
+    transcript = Transcript()
+    started = time.perf_counter()
+    for i in range(args.messages):
+        role = "user" if i % 2 == 0 else "assistant"
+        content = f"Question {i} about hash tables?" if role == "user" else ASSISTANT_REPLY
+        messages.append({"role": role, "content": content})
+        transcript.append(role, content)
+    append_ms = (time.perf_counter() - started) * 1000
+
+    for name, rerun, state in (
+        ("legacy", legacy_rerun, messages),
+        ("windowed", windowed_rerun, transcript),
+    ):
+        drawn = []
+        started = time.perf_counter()
+        for _ in range(args.reruns):
+            drawn.clear()
+            rerun(state, drawn.append)
+        per_rerun = (time.perf_counter() - started) * 1000 / args.reruns
+        print(f"{name:>9}: {per_rerun:8.3f} ms/rerun, {len(drawn):4d} elements drawn")
+    print(f"{'append':>9}: {append_ms:8.3f} ms to parse {args.messages} messages once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Deterministic synthetic documents for the benchmarks.
+
+Writes minimal PDFs directly (one Helvetica text stream per page), so
+no PDF library or sample files are needed to produce a corpus of any size.
+"""
+import random
+from typing import List
+
+
+TOPICS = [
+    "hash tables", "binary search trees", "graph traversal", "dynamic programming",
+    "priority queues", "amortized analysis", "sorting algorithms", "union find",
+    "shortest paths", "minimum spanning trees", "recursion", "memory management",
+]
+WORDS = (
+    "the a an implement function return value pointer array node edge vertex key bucket "
+    "collision probe insert erase lookup complexity runtime memory iterator template class "
+    "struct test case expected output input student submission autograder points style"
+).split()
+
+
+class NamedBytes:
+    """Minimal stand-in for a Streamlit UploadedFile"""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+
+    def getvalue(self) -> bytes:
+        return self.data
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """A PDF with one page per list of text lines"""
+    objects: List[bytes] = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    font_id = 1
+    content_ids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 40 760 Td 12 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        data = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        content_ids.append(len(objects))
+
+    pages_id = len(objects) + len(pages) + 1
+    page_ids = []
+    for content_id in content_ids:
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        )
+        page_ids.append(len(objects))
+    objects.append(
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+    )
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    catalog_id = len(objects)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
+
+
+def course_pages(count: int, seed: int = 0, lines_per_page: int = 50) -> List[List[str]]:
+    """Pages of project-spec-like text with section headers, bullets and a rubric"""
+    rng = random.Random(seed)
+    pages = []
+    for number in range(count):
+        topic = TOPICS[number % len(TOPICS)]
+        header = "GRADING RUBRIC" if number % 7 == 6 else f"SECTION {number + 1}: {topic.upper()}"
+        lines = [header]
+        for i in range(lines_per_page - 1):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14)))
+            lines.append(f"- {sentence}." if i % 9 == 0 else f"EECS 281 {topic}: {sentence}.")
+        pages.append(lines)
+    return pages
+
+
+def audit_pages(count: int, seed: int = 0) -> List[List[str]]:
+    """Pages shaped like a degree audit export"""
+    rng = random.Random(seed)
+    subjects = ["EECS", "MATH", "STATS", "PHYSICS", "ENGLISH", "HISTORY"]
+    pages = []
+    for number in range(count):
+        lines = (
+            ["University of Michigan Degree Audit", "Name: Test Student   Cumulative GPA: 3.512"]
+            if number == 0 else ["Degree Audit (continued)   * - In Progress"]
+        )
+        for r in range(4):
+            status = rng.choice(["Satisfied", "Not Satisfied"])
+            lines.append(f"{status}: Requirement {number}.{r} {rng.choice(TOPICS).title()}")
+            for _ in range(rng.randint(1, 4)):
+                grade = rng.choice(["A", "A-", "B+", "B", "*"])
+                lines.append(
+                    f"FA {2021 + rng.randint(0, 3)}   {rng.choice(subjects)} {rng.randint(100, 499)}   "
+                    f"{rng.choice(TOPICS).title()}   {rng.choice([3, 4])}.00   {grade}"
+                )
+        if number == count - 1:
+            lines += ["Course History", "FA 2021 ENGR 101 Intro 4.00 A"]
+        pages.append(lines)
+    return pages
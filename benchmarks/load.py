@@ -0,0 +1,250 @@
+"""
+Concurrent-session load generator for the chat path.
+
+Simulates students the way dashboard.py drives LMMentorBot: one bot per
+session, some sessions upload course files first, then ask a question,
+send follow-ups and click quiz options parsed from the answers. The
+stand-in LLM and embedder come from fakes.py, so no API budget is spent.
+
+Reports throughput, latency percentiles per turn kind, time to first
+token, memory per session and history-store growth over time, for each
+session count in the sweep. Memory is process RSS by default; with
+--trace-memory it is the Python heap as seen by tracemalloc, which is
+more precise but slows every turn down several times over.
+
+    python benchmarks/load.py --sessions 10,50,100 --turns 8
+"""
+import argparse
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import NamedBytes, course_pages, make_pdf  # noqa: E402
+from suite import QUESTIONS, Placeholder, percentile  # noqa: E402
+from transcript import Message  # noqa: E402
+
+FOLLOW_UPS = [
+    "why is that?",
+    "can you give me a hint for the next step?",
+    "what about the edge cases?",
+    "I'm still confused, can you explain it differently?",
+]
+ANSWERS = [
+    "Good question. What happens when two keys hash to the same bucket? Think about the probe sequence.\n"
+    "[OPTIONS]\nA) Overwrite the old key\nB) Probe the next slot\nC) Resize immediately\nD) Throw an error\n[/OPTIONS]",
+    "Let's trace it together. Which loop runs the most times, and how does that grow with n?",
+    "Close! Consider what the rubric says about style and comments.\n"
+    "[OPTIONS]\nA) Style is optional\nB) Style is worth points\n[/OPTIONS]",
+]
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # No procfs (e.g. macOS); peak RSS is the closest stand-in, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.ttfts: List[float] = []
+        self.errors = 0
+        self.turns = 0
+
+    def record(self, kind: str, seconds: float, ttft) -> None:
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(seconds * 1000)
+            if ttft is not None:
+                self.ttfts.append(ttft * 1000)
+            self.turns += 1
+
+
+def run_session(number: int, args, make_bot, files, stats: LoadStats, start_at: float) -> None:
+    rng = random.Random(number)
+    time.sleep(max(0.0, start_at - time.monotonic()))
+    bot = make_bot()
+    session_id = f"load-{number}"
+
+    def turn(kind: str, text: str) -> str:
+        started = time.monotonic()
+        answer = bot.chat_stream(text, session_id, placeholder=Placeholder())
+        latency = time.monotonic() - started
+        if answer.startswith("Error processing message"):
+            with stats.lock:
+                stats.errors += 1
+        stats.record(kind, latency, bot.last_stream_stats.time_to_first_token if bot.last_stream_stats else None)
+        time.sleep(rng.uniform(0, args.think_time))
+        return answer
+
+    if rng.random() < args.upload_rate:
+        for uploaded in rng.sample(files, rng.randint(1, min(2, len(files)))):
+            started = time.monotonic()
+            bot.upload_file(uploaded)
+            stats.record("upload", time.monotonic() - started, None)
+
+    answer = turn("question", rng.choice(QUESTIONS))
+    for _ in range(args.turns - 1):
+        # Quiz buttons send "B) option text", as in dashboard.py
+        options = Message("assistant", answer).options
+        if options and rng.random() < 0.7:
+            letter, option = rng.choice(options)
+            answer = turn("quiz_click", f"{letter}) {option}")
+        elif rng.random() < 0.2:
+            answer = turn("question", rng.choice(QUESTIONS))
+        else:
+            answer = turn("follow_up", rng.choice(FOLLOW_UPS))
+
+
+def run_load(sessions: int, args) -> Dict:
+    from chat_responses import LMMentorBot
+    from fakes import FakeChatModel, FakeEmbeddings
+    from file_parser import FileParser
+    from history_store import SessionHistoryStore, SQLiteHistoryBackend
+
+    workdir = tempfile.mkdtemp(prefix=f"conmodus-load-{sessions}-")
+    os.symlink(os.path.join(ROOT, "prompts"), os.path.join(workdir, "prompts"))
+    os.chdir(workdir)
+
+    # Process-wide pieces are shared by every session, as in the app
+    parser = FileParser(
+        embeddings=FakeEmbeddings(dimension=256, latency=args.embed_latency, per_text_latency=0.0005),
+        embedding_model="fake-256",
+    )
+    llm = FakeChatModel(
+        responses=ANSWERS,
+        first_token_latency=args.llm_first_token_latency,
+        token_latency=args.llm_token_latency,
+    )
+    store = SessionHistoryStore(
+        backend=SQLiteHistoryBackend(os.path.join(workdir, "history.sqlite3")),
+        max_hot=args.max_hot,
+        idle_timeout=args.idle_timeout,
+    )
+    files = [
+        NamedBytes(f"eecs281_project{i}.pdf", make_pdf(course_pages(args.file_pages, seed=i)))
+        for i in range(args.files)
+    ]
+
+    def make_bot():
+        return LMMentorBot(llm=llm, file_parser=parser, store=store)
+
+    # Load the modules and warm the parser before measuring memory
+    make_bot()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    def memory() -> int:
+        return tracemalloc.get_traced_memory()[0] if args.trace_memory else rss_bytes()
+
+    memory_before = memory()
+
+    stats = LoadStats()
+    samples = []
+    done = threading.Event()
+
+    def sample():
+        started = time.monotonic()
+        while not done.wait(args.sample_interval):
+            samples.append((time.monotonic() - started, stats.turns, store.stats(), memory()))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [
+            pool.submit(run_session, n, args, make_bot, files, stats, started + args.ramp * n / sessions)
+            for n in range(sessions)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.monotonic() - started
+    done.set()
+    sampler.join()
+
+    peak = max([memory()] + [sample[3] for sample in samples])
+    if args.trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    chat_turns = [v for kind, values in stats.latencies.items() if kind != "upload" for v in values]
+    return {
+        "sessions": sessions,
+        "seconds": elapsed,
+        "turns": stats.turns,
+        "errors": stats.errors,
+        "turns_per_sec": len(chat_turns) / elapsed,
+        "latency": {
+            kind: (percentile(values, 50), percentile(values, 95), percentile(values, 99))
+            for kind, values in stats.latencies.items()
+        },
+        "ttft": (percentile(stats.ttfts, 50), percentile(stats.ttfts, 99)) if stats.ttfts else None,
+        "memory_per_session_kb": (peak - memory_before) / sessions / 1024,
+        "memory_kind": "traced heap" if args.trace_memory else "RSS",
+        "store": store.stats(),
+        "samples": samples,
+    }
+
+
+def report(result: Dict) -> None:
+    print(f"\n=== {result['sessions']} concurrent sessions ===")
+    print(
+        f"{result['turns']} turns in {result['seconds']:.1f}s, "
+        f"{result['turns_per_sec']:.1f} chat turns/s, {result['errors']} errors"
+    )
+    print(f"  {'kind':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, (p50, p95, p99) in sorted(result["latency"].items()):
+        print(f"  {kind:<12}{p50:10.0f}{p95:10.0f}{p99:10.0f}")
+    if result["ttft"]:
+        print(f"  time to first token p50={result['ttft'][0]:.0f}ms p99={result['ttft'][1]:.0f}ms")
+    print(f"  {result['memory_kind']} growth per session: {result['memory_per_session_kb']:.0f} KiB")
+    print(f"  history store at end: {result['store']}")
+    print(f"  {'t (s)':>7}{'turns':>8}{'hot':>6}{'cold':>6}{'spills':>8}{'memory MiB':>12}")
+    for at, turns, store, memory in result["samples"]:
+        print(f"  {at:7.1f}{turns:8d}{store['hot']:6d}{store['cold']:6d}{store['spills']:8d}{memory / 2 ** 20:12.1f}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="10,50", help="concurrent session counts to sweep")
+    parser.add_argument("--turns", type=int, default=6, help="chat turns per session")
+    parser.add_argument("--upload-rate", type=float, default=0.5, help="fraction of sessions that upload files")
+    parser.add_argument("--files", type=int, default=3, help="distinct course files shared by sessions")
+    parser.add_argument("--file-pages", type=int, default=20)
+    parser.add_argument("--think-time", type=float, default=1.0, help="max seconds between a student's turns")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--llm-first-token-latency", type=float, default=0.3)
+    parser.add_argument("--llm-token-latency", type=float, default=0.005)
+    parser.add_argument("--max-hot", type=int, default=500, help="history store in-memory bound")
+    parser.add_argument("--idle-timeout", type=float, default=30 * 60)
+    parser.add_argument("--sample-interval", type=float, default=2.0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure the Python heap with tracemalloc instead of RSS (much slower)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    for sessions in (int(n) for n in args.sessions.split(",")):
+        report(run_load(sessions, args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
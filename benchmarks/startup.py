@@ -0,0 +1,91 @@
+"""
+Cold-start benchmark for the dashboard entry point.
+
+Imports the module in fresh interpreters with `-X importtime`, reports the
+slowest imports, and fails if the best wall time exceeds the budget or if
+any module that should be deferred until first use was loaded at startup.
+
+    python benchmarks/startup.py [--module dashboard] [--budget-ms 1500] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only loaded once a file is uploaded or a message is sent
+DEFERRED = [
+    "chat_responses",
+    "langchain",
+    "langchain_core",
+    "langchain_anthropic",
+    "chromadb",
+    "pypdf",
+    "googleapiclient",
+    "audit_parse",
+    "feedback",
+]
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_import(module: str) -> Tuple[float, Dict[str, Tuple[int, int, int]]]:
+    """Wall seconds to import module in a new interpreter, and per-module (self, cumulative, depth) us"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        tail = "\n".join(completed.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"import {module} failed:\n{tail}")
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = (int(own), int(cumulative), len(indent) // 2)
+    return wall, modules
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="dashboard")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    runs = [profile_import(args.module) for _ in range(args.repeat)]
+    wall, modules = min(runs, key=lambda run: run[0])
+
+    print(f"Slowest imports for `import {args.module}` (cumulative ms, self ms):")
+    # Top-level packages only, so nested imports aren't counted twice
+    top_level = [(name, stats) for name, stats in modules.items() if stats[2] <= 1]
+    for name, (own, cumulative, _) in sorted(top_level, key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} {own / 1000:8.1f}  {name}")
+
+    loaded_early = [name for name in DEFERRED if name in modules]
+    print(f"\nbest of {args.repeat}: {wall * 1000:.0f}ms (budget {args.budget_ms:.0f}ms)")
+    failed = False
+    if loaded_early:
+        print(f"FAIL: deferred modules imported at startup: {', '.join(loaded_early)}")
+        failed = True
+    if wall * 1000 > args.budget_ms:
+        print("FAIL: over the startup budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Offline benchmark suite for ingestion, retrieval and chat latency.
+
+Runs the real FileParser, audit parser, RAG retrieval and chat_stream code
+paths against fake embedding and chat backends with configurable latency,
+over synthetic corpora of several sizes. Results can be saved as a baseline
+and later runs compared against it; a regression beyond the tolerance
+exits non-zero.
+
+benchmarks/baseline.json is the reference baseline, saved with the config
+that produced it. A comparison reruns that config unless flags override
+it. Run it before deploying:
+
+    python benchmarks/suite.py --compare benchmarks/baseline.json
+
+Timings depend on the machine, so after changing hardware, or after an
+intended slowdown, save a new baseline from main and commit it:
+
+    python benchmarks/suite.py --repeat 3 --save benchmarks/baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import NamedBytes, audit_pages, course_pages, make_pdf  # noqa: E402
+
+QUESTIONS = [
+    "How do I handle collisions in the hash table?",
+    "What is the runtime complexity of insert and erase?",
+    "How many points is style worth in the grading rubric?",
+    "Explain graph traversal with an example",
+    "What does the autograder expect as output?",
+    "When should I use a priority queue instead of sorting?",
+]
+FOLLOW_UPS = ["why is that?", "can you explain it again?", "B) a hash table"]
+ANSWER = (
+    "Think about what happens when two keys land in the same bucket. "
+    "What could the table do with the second key? Try tracing insert by hand first."
+)
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class Placeholder:
+    """Collects chat_stream's UI updates instead of drawing them"""
+
+    def __init__(self):
+        self.updates = 0
+
+    def markdown(self, text):
+        self.updates += 1
+
+
+def bench_size(pages: int, args, run: int = 0) -> Dict[str, float]:
+    from audit_parse import extract_text_fromaudit
+    from chat_responses import LMMentorBot
+    from fakes import FakeChatModel, FakeEmbeddings
+    from file_parser import FileParser
+
+    results: Dict[str, float] = {}
+    # Repeats need documents the registry hasn't seen, or ingestion is skipped
+    seed = pages + 1000 * run
+    spec = make_pdf(course_pages(pages, seed=seed))
+    audit = make_pdf(audit_pages(pages, seed=seed))
+
+    embeddings = FakeEmbeddings(
+        dimension=args.dimension,
+        latency=args.embed_latency,
+        per_text_latency=args.embed_per_text_latency,
+    )
+    parser = FileParser(embeddings=embeddings, embedding_model=f"fake-{args.dimension}")
+
+    started = time.perf_counter()
+    parser.extract_structured_pdf(spec)
+    results["extract_pages_per_sec"] = pages / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    extract_text_fromaudit(audit)
+    results["audit_pages_per_sec"] = pages / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    store = parser.parse_file(NamedBytes(f"project_{seed}.pdf", spec))
+    seconds = time.perf_counter() - started
+    chunks = store._collection.count()
+    results["ingest_pages_per_sec"] = pages / seconds
+    results["ingest_chunks_per_sec"] = chunks / seconds
+
+    llm = FakeChatModel(
+        responses=[ANSWER],
+        first_token_latency=args.llm_first_token_latency,
+        token_latency=args.llm_token_latency,
+    )
+    bot = LMMentorBot(llm=llm, file_parser=parser)
+    # Already registered, so this attaches the stored collection
+    bot.upload_file(NamedBytes(f"project_{seed}.pdf", spec))
+
+    timings = []
+    for i in range(args.queries):
+        started = time.perf_counter()
+        bot.retriever.invoke({"input": QUESTIONS[i % len(QUESTIONS)], "chat_history": []})
+        timings.append((time.perf_counter() - started) * 1000)
+    results["retrieval_p50_ms"] = percentile(timings, 50)
+    results["retrieval_p99_ms"] = percentile(timings, 99)
+
+    # Follow-ups go through the speculative rewrite path
+    history = [("human", QUESTIONS[0]), ("ai", ANSWER)]
+    timings = []
+    for i in range(max(1, args.queries // 4)):
+        started = time.perf_counter()
+        bot.retriever.invoke({"input": FOLLOW_UPS[i % len(FOLLOW_UPS)], "chat_history": history})
+        timings.append((time.perf_counter() - started) * 1000)
+    results["followup_retrieval_p50_ms"] = percentile(timings, 50)
+
+    ttfts, rates = [], []
+    for i in range(args.turns):
+        bot.chat_stream(QUESTIONS[i % len(QUESTIONS)], f"bench-{seed}-{i}", placeholder=Placeholder())
+        stats = bot.last_stream_stats
+        ttfts.append(stats.time_to_first_token * 1000)
+        rates.append(stats.tokens_per_second)
+    results["ttft_p50_ms"] = percentile(ttfts, 50)
+    results["ttft_p99_ms"] = percentile(ttfts, 99)
+    results["stream_tokens_per_sec"] = percentile(rates, 50)
+    return results
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_sec")
+
+
+def best_of(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """Best value of each metric over repeated runs, the least disturbed by noise"""
+    pick = {True: max, False: min}
+    return {metric: pick[higher_is_better(metric)](run[metric] for run in runs) for metric in runs[0]}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than the tolerance"""
+    regressions = []
+    for size, metrics in results.items():
+        for metric, value in metrics.items():
+            before = baseline.get(size, {}).get(metric)
+            if not before:
+                continue
+            change = (value - before) / before
+            worse = -change if higher_is_better(metric) else change
+            if worse > tolerance:
+                regressions.append(f"{size} pages {metric}: {before:.1f} -> {value:.1f} ({change:+.0%})")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,50,200", help="corpus sizes in pages")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="seconds per embedding call")
+    parser.add_argument("--embed-per-text-latency", type=float, default=0.0005)
+    parser.add_argument("--llm-first-token-latency", type=float, default=0.3)
+    parser.add_argument("--llm-token-latency", type=float, default=0.005)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size, keeping each metric's best")
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="baseline file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(ROOT, args.compare) if not os.path.isabs(args.compare) else args.compare) as f:
+            baseline = json.load(f)
+        # Measure what the baseline measured; explicit flags still win
+        parser.set_defaults(**{k: v for k, v in baseline["config"].items() if k != "tolerance"})
+        args = parser.parse_args(argv)
+        if baseline.get("machine") != platform.platform():
+            print(f"Note: baseline was saved on {baseline.get('machine')}; timings may not compare")
+
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    # Fresh chroma_db, caches and history under a scratch directory
+    workdir = tempfile.mkdtemp(prefix="conmodus-bench-")
+    os.symlink(os.path.join(ROOT, "prompts"), os.path.join(workdir, "prompts"))
+    os.chdir(workdir)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for pages in sizes:
+        results[str(pages)] = best_of([bench_size(pages, args, run) for run in range(args.repeat)])
+        print(f"{pages} pages:")
+        for metric, value in results[str(pages)].items():
+            print(f"  {metric:<28}{value:10.1f}")
+
+    status = 0
+    if baseline is not None:
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+    if args.save:
+        path = os.path.join(ROOT, args.save) if not os.path.isabs(args.save) else args.save
+        with open(path, "w") as f:
+            json.dump({
+                "config": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,78 +1,97 @@
-import os
 import streamlit as st
-from typing import Optional, Dict
+import asyncio
+import logging
+import re
+import time
+from typing import AsyncIterator, Iterator, Optional, Tuple
 from dotenv import load_dotenv
-from langchain_anthropic import ChatAnthropic
 
 load_dotenv()  # Load from .env file
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_community.vectorstores import Chroma
 from file_parser import FileParser
+from history_store import SessionHistoryStore, get_history_store
+from history_window import HistoryCompactor, estimate_tokens
+from ingestion_jobs import CANCELLED, DONE, IngestionJob, IngestionJobManager
+from document_set import DocumentSet
+from lexical_index import HybridRetriever
+from query_router import QueryRouter
+from response_cache import SemanticResponseCache
+from speculative_retrieval import SpeculativeRetriever
+from streaming import CoalescingWriter, StreamStats
+import model_clients
 
-class LMMentorBot:
-    def __init__(self):
-        try:
-            # Initialize API keys - try st.secrets first, then env vars
-            self.anthropic_key = st.secrets.get("ANTHROPIC_API_KEY") or st.secrets.get("ANTHROPIC_KEY") or os.getenv("ANTHROPIC_API_KEY")
-            self.google_key = st.secrets.get("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY", "")
+logger = logging.getLogger(__name__)
 
-            if not self.anthropic_key:
-                raise KeyError("ANTHROPIC_API_KEY not found")
 
+class LMMentorBot:
+    def __init__(
+        self,
+        llm=None,
+        file_parser: Optional[FileParser] = None,
+        store: Optional[SessionHistoryStore] = None,
+        response_cache: Optional[SemanticResponseCache] = None
+    ):
+        try:
             self.setup_environment()
 
-            # Initialize core components
-            self.llm = ChatAnthropic(
-                model="claude-sonnet-4-20250514",
-                anthropic_api_key=self.anthropic_key,
-                temperature=0.7,
-                streaming=True,
-            )
-
-            self.file_parser = FileParser(self.google_key)
+            # Model clients and the file parser are shared process-wide;
+            # an injected model (e.g. for tests) gets its own chain skeletons
+            self.shared_llm = llm is None
+            self.llm = llm or model_clients.get_llm()
+            self.file_parser = file_parser or model_clients.get_file_parser()
+            # Uploads queue for the shared, capped ingestion slots
+            if file_parser is None:
+                self.ingestion_jobs = model_clients.get_ingestion_jobs()
+            else:
+                self.ingestion_jobs = IngestionJobManager(self.file_parser)
+            if self.shared_llm:
+                self.compactor = model_clients.get_history_compactor()
+            else:
+                self.compactor = HistoryCompactor(self.llm)
+            # Opt-in cache of first-turn answers, shared process-wide
+            self.response_cache = response_cache or model_clients.get_response_cache()
             
         except KeyError:
             st.error("Required API keys not found in secrets. Please add them to your Streamlit secrets.")
             st.stop()
 
-        # Initialize storage and state
-        self.store: Dict[str, ChatMessageHistory] = {}
-        self.vector_store: Optional[Chroma] = None
+        # Initialize per-session storage and state; histories live in a
+        # bounded process-wide store that spills idle sessions to disk
+        self.store: SessionHistoryStore = store if store is not None else get_history_store()
+        # Uploaded documents are attached to this set; the RAG chain reads
+        # it on every turn, so it is built once rather than per upload
+        self.documents = DocumentSet(self.file_parser.embeddings)
         self.default_chain = None
         self.rag_chain = None
+        self.retriever: Optional[SpeculativeRetriever] = None
+        # Time to first token and throughput of the latest streamed answer
+        self.last_stream_stats: Optional[StreamStats] = None
 
         
         # Setup default conversation chain
         self.setup_default_chain()
+        self.setup_rag_chain()
 
     def setup_environment(self):
         """Setup environment variables"""
-        langchain_key = st.secrets.get("LANGCHAIN_API_KEY") or os.getenv("LANGCHAIN_API_KEY")
-        if langchain_key:
-            os.environ["LANGCHAIN_TRACING_V2"] = "true"
-            os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
-            os.environ["LANGCHAIN_API_KEY"] = langchain_key
+        model_clients.configure_tracing()
+
+    def compact_history_step(self) -> RunnableLambda:
+        """Swap the full chat history for recent turns plus a rolling summary"""
+        base_tokens = estimate_tokens(model_clients.load_prompt("mentor_prompt.txt"))
+        return RunnableLambda(self.compactor.runnable_step(base_tokens))
 
     def setup_default_chain(self):
         """Set up the default conversation chain without RAG"""
-        with open("prompts/mentor_prompt.txt", "r") as f:
-            mentor_prompt = f.read()
-
-        default_template = ChatPromptTemplate.from_messages([
-            ("system", mentor_prompt),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ])
+        if self.shared_llm:
+            runnable = model_clients.shared_default_runnable()
+        else:
+            runnable = model_clients.build_default_runnable(self.llm)
 
         self.default_chain = RunnableWithMessageHistory(
-            (lambda x: {"input": x["input"], "context": "", "chat_history": x["chat_history"]}) |
-            default_template |
-            self.llm,
+            self.compact_history_step() | runnable,
             self.get_session_history,
             input_messages_key="input",
             history_messages_key="chat_history",
@@ -81,52 +100,31 @@ class LMMentorBot:
 
     def setup_rag_chain(self):
         """Set up the RAG chain with prompts and retrievers"""
-        if not self.vector_store:
-            return
-
-        # Load prompts
-        with open("prompts/retriever_prompt.txt", "r") as f:
-            retriever_prompt = f.read()
-        
-        with open("prompts/mentor_prompt.txt", "r") as f:
-            mentor_prompt = f.read()
-
-        # Create prompt templates
-        retriever_template = ChatPromptTemplate.from_messages([
-            ("system", retriever_prompt),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ])
-
-        mentor_template = ChatPromptTemplate.from_messages([
-            ("system", mentor_prompt),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-            ("system", "Context: {context}")
-        ])
-
-        # Set up history-aware retriever
-        retriever = self.vector_store.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 4}
-        )
+        # Dense + BM25 retrieval over every attached document, falling back
+        # to BM25 alone if embeddings are down
+        retriever = HybridRetriever(self.documents, self.documents, k=4, router=QueryRouter())
         
-        history_aware_retriever = create_history_aware_retriever(
-            self.llm,
+        # Set up history-aware retriever; searching starts with the raw
+        # input while the query rewrite is still in flight
+        self.retriever = SpeculativeRetriever(
             retriever,
-            retriever_template
+            self.llm,
+            model_clients.retriever_template(),
+            k=4
         )
+        history_aware_retriever = self.retriever.as_runnable()
         
-        # Create document chain
-        document_chain = create_stuff_documents_chain(
-            llm=self.llm,
-            prompt=mentor_template,
-            document_variable_name="context"
-        )
+        # Document chain is shared unless a model was injected
+        if self.shared_llm:
+            document_chain = model_clients.shared_document_chain()
+        else:
+            document_chain = model_clients.build_document_chain(self.llm)
         
-        # Create retrieval chain with proper chat history handling
+        # Create retrieval chain with proper chat history handling; the
+        # compacted history feeds both the query rewriter and the mentor prompt
         retrieval_chain = (
-            {
+            self.compact_history_step()
+            | {
                 "context": history_aware_retriever, 
                 "input": lambda x: x["input"],
                 "chat_history": lambda x: x.get("chat_history", [])
@@ -144,77 +142,164 @@ class LMMentorBot:
         )
     def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
         """Get or create chat history for a session"""
-        if session_id not in self.store:
-            self.store[session_id] = ChatMessageHistory()
-        return self.store[session_id]
+        return self.store.get(session_id)
+
+    def start_upload(self, uploaded_file) -> IngestionJob:
+        """
+        Ingest an uploaded file in the background and return its job.
+
+        The document joins the session's context as soon as ingestion
+        starts, so chat keeps working and sees chunks as they are embedded.
+        """
+        def attach(job: IngestionJob):
+            self.documents.add(job.source, job.ingestion)
+
+        def detach_failed(job: IngestionJob):
+            if job.status != DONE and job.ingestion is not None:
+                self.documents.detach(job.ingestion.key)
+
+        return self.ingestion_jobs.submit(uploaded_file, on_start=attach, on_finish=detach_failed)
 
     def upload_file(self, uploaded_file) -> str:
-        """Process uploaded file and create vector store for context"""
-        try:
-            self.vector_store = self.file_parser.parse_file(uploaded_file)
-            if self.vector_store:
-                self.setup_rag_chain()
-                return f"Successfully processed {uploaded_file.name}. Ready for context-aware responses!"
+        """Process uploaded file and add it to the session's context"""
+        if uploaded_file is None:
             return "No file uploaded."
+        job = self.start_upload(uploaded_file).wait()
+        if job.status == DONE:
+            return f"Successfully processed {uploaded_file.name}. Ready for context-aware responses!"
+        if job.status == CANCELLED:
+            return f"Processing of {uploaded_file.name} was cancelled."
+        return str(job.error)
+
+    def remove_file(self, file_name: str) -> str:
+        """Stop using an uploaded file as context"""
+        if self.documents.remove(file_name):
+            return f"Removed {file_name} from the context."
+        return f"{file_name} is not in the context."
+
+    def document_set_key(self) -> str:
+        """Identity of the documents answers are currently grounded in"""
+        return ",".join(sorted(self.documents.keys()))
+
+    def _cache_lookup(self, text: str, session_id: str) -> Tuple[bool, Optional[str]]:
+        """Return whether this turn is cacheable and any cached answer for it"""
+        # Answers grounded in a half-indexed document mustn't be reused
+        if self.response_cache is None or self.documents.indexing:
+            return False, None
+        try:
+            # Only first turns are independent of the conversation so far
+            history = self.get_session_history(session_id)
+            if history.messages:
+                return False, None
+            answer = self.response_cache.lookup(self.document_set_key(), text)
+            if answer is not None:
+                # Keep the history as if the answer had been generated
+                history.add_user_message(text)
+                history.add_ai_message(answer)
+            return True, answer
         except Exception as e:
-            return str(e)
+            logger.warning("Response cache lookup failed: %s", e)
+            return False, None
+
+    def _cache_store(self, text: str, answer: str, started: float):
+        # Reuses the lookup's question embedding and runs in the background
+        self.response_cache.store_in_background(self.document_set_key(), text, answer, time.monotonic() - started)
+
+    @staticmethod
+    def _replay(answer: str) -> Iterator[str]:
+        """Stream a cached answer word by word through the normal UI path"""
+        yield from re.findall(r"\S+\s*", answer) or [answer]
 
     def chat(self, text: str, session_id: str = "default") -> str:
         """Process a chat message and return response"""
         try:
+            cacheable, cached = self._cache_lookup(text, session_id)
+            if cached is not None:
+                return cached
+
+            started = time.monotonic()
             # Use RAG chain if available, otherwise use default chain
-            chain = self.rag_chain if self.vector_store else self.default_chain
+            chain = self.rag_chain if self.documents else self.default_chain
             response = chain.invoke(
                 {"input": text},
                 config={"configurable": {"session_id": session_id}}
             )
             # Handle both possible output formats
             if isinstance(response, dict):
-                return response.get("answer", response.get("output", response.get("text", str(response))))
-            return str(response)
+                answer = response.get("answer", response.get("output", response.get("text", str(response))))
+            else:
+                answer = self._chunk_text(response)
+            if cacheable:
+                self._cache_store(text, answer, started)
+            return answer
         except Exception as e:
             return f"Error processing message: {str(e)}"
 
-    def chat_stream(self, text: str, session_id: str = "default"):
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Extract the text from a chain's output"""
+        # Handle different types of chunks
+        if hasattr(chunk, "content"):
+            # For ChatMessage objects
+            return chunk.content
+        if isinstance(chunk, dict):
+            # For dictionary responses, try different keys
+            content = (
+                chunk.get("output", "") or
+                chunk.get("response", "") or
+                chunk.get("answer", "") or
+                chunk.get("text", "") or
+                ""
+            )
+            # If content is still empty but we have a non-empty dict, convert it to string
+            if not content and chunk:
+                content = str(chunk)
+            return content
+        # For string or other types
+        return str(chunk)
+
+    def _log_stream(self, stats: StreamStats, session_id: str) -> None:
+        self.last_stream_stats = stats
+        details = stats.as_dict()
+        logger.info(
+            "stream session=%s ttft=%s tokens/s=%s tokens=%d ui_updates=%d",
+            session_id,
+            "-" if details["time_to_first_token"] is None else f"{details['time_to_first_token'] * 1000:.0f}ms",
+            "-" if details["tokens_per_second"] is None else f"{details['tokens_per_second']:.1f}",
+            details["tokens"],
+            details["ui_updates"],
+        )
+
+    def chat_stream(self, text: str, session_id: str = "default", placeholder=None):
         """Stream chat responses"""
         try:
-            chain = self.rag_chain if self.vector_store else self.default_chain
+            chain = self.rag_chain if self.documents else self.default_chain
             
             # Create an empty placeholder for the message
-            message_placeholder = st.empty()
-            full_response = ""
+            message_placeholder = placeholder or st.empty()
+            # Tokens are batched into a few re-renders per second
+            writer = CoalescingWriter(message_placeholder.markdown)
+
+            cacheable, cached = self._cache_lookup(text, session_id)
+            started = time.monotonic()
+            if cached is not None:
+                chunks = self._replay(cached)
+            else:
+                # Both chains end in a string parser, so chunks are plain text
+                chunks = chain.stream(
+                    {"input": text},
+                    config={"configurable": {"session_id": session_id}}
+                )
 
             # Stream the response
-            for chunk in chain.stream(
-                {"input": text},
-                config={"configurable": {"session_id": session_id}}
-            ):
-                # Handle different types of chunks
-                if hasattr(chunk, "content"):
-                    # For ChatMessage objects
-                    content = chunk.content
-                elif isinstance(chunk, dict):
-                    # For dictionary responses, try different keys
-                    content = (
-                        chunk.get("output", "") or
-                        chunk.get("response", "") or
-                        chunk.get("answer", "") or
-                        chunk.get("text", "") or
-                        ""
-                    )
-                    # If content is still empty but we have a non-empty dict, convert it to string
-                    if not content and chunk:
-                        content = str(chunk)
-                else:
-                    # For string or other types
-                    content = str(chunk)
-                
-                if content and not content.startswith('{'):  # Avoid printing raw JSON
-                    full_response += content
-                    message_placeholder.markdown(full_response + "▌")
+            for chunk in chunks:
+                writer.write(chunk)
 
             # Final update without the cursor
-            message_placeholder.markdown(full_response)
+            full_response = writer.close()
+            self._log_stream(writer.stats, session_id)
+            if cacheable and cached is None and full_response:
+                self._cache_store(text, full_response, started)
             return full_response
 
         except Exception as e:
@@ -222,7 +307,62 @@ class LMMentorBot:
             st.error(error_msg)
             return error_msg
 
+    async def aupload_file(self, uploaded_file) -> str:
+        """Process an uploaded file without blocking the event loop"""
+        return await asyncio.to_thread(self.upload_file, uploaded_file)
+
+    async def achat(self, text: str, session_id: str = "default") -> str:
+        """Async version of chat"""
+        try:
+            cacheable, cached = await asyncio.to_thread(self._cache_lookup, text, session_id)
+            if cached is not None:
+                return cached
+
+            started = time.monotonic()
+            chain = self.rag_chain if self.documents else self.default_chain
+            response = await chain.ainvoke(
+                {"input": text},
+                config={"configurable": {"session_id": session_id}}
+            )
+            if isinstance(response, dict):
+                answer = response.get("answer", response.get("output", response.get("text", str(response))))
+            else:
+                answer = self._chunk_text(response)
+            if cacheable:
+                self._cache_store(text, answer, started)
+            return answer
+        except Exception as e:
+            return f"Error processing message: {str(e)}"
+
+    async def astream(self, text: str, session_id: str = "default") -> AsyncIterator[str]:
+        """Yield response text as it is generated, without any Streamlit UI"""
+        cacheable, cached = await asyncio.to_thread(self._cache_lookup, text, session_id)
+        if cached is not None:
+            for content in self._replay(cached):
+                yield content
+            return
+
+        started = time.monotonic()
+        stats = StreamStats()
+        parts = []
+        chain = self.rag_chain if self.documents else self.default_chain
+        # Both chains end in a string parser, so chunks are plain text
+        async for chunk in chain.astream(
+            {"input": text},
+            config={"configurable": {"session_id": session_id}}
+        ):
+            if chunk:
+                stats.record(chunk)
+                parts.append(chunk)
+                yield chunk
+
+        self._log_stream(stats.finish(), session_id)
+        full_response = "".join(parts)
+        if cacheable and full_response:
+            self._cache_store(text, full_response, started)
+
     def reset(self, session_id: str = "default"):
         """Reset the conversation state for a session"""
         if session_id in self.store:
             del self.store[session_id]
+        self.compactor.forget(session_id)
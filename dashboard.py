@@ -2,11 +2,9 @@ __import__('pysqlite3')
 import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
-import re
+import uuid
 import streamlit as st
-from chat_responses import LMMentorBot
-from audit_parse import extract_text_fromaudit
-from feedback import append_values
+from transcript import Transcript
 
 # Set page configuration
 st.set_page_config(
@@ -68,32 +66,10 @@ st.markdown("""
     </div>
     """, unsafe_allow_html=True)
 
-def parse_options(text):
-    """Parse [OPTIONS]...[/OPTIONS] block from response - get the LAST one"""
-    pattern = r'\[OPTIONS\](.*?)\[/OPTIONS\]'
-    matches = list(re.finditer(pattern, text, re.DOTALL | re.IGNORECASE))
-
-    if matches:
-        # Use the last OPTIONS block (most recent question)
-        match = matches[-1]
-        options_text = match.group(1).strip()
-
-        # Parse individual options - handle both newline and inline formats
-        # Match A) ... B) ... patterns
-        options = re.findall(r'([A-D])\)\s*([^A-D]+?)(?=(?:\s*[A-D]\)|$))', options_text, re.DOTALL)
-        options = [(letter, text.strip()) for letter, text in options]
-
-        # Remove ALL options blocks from the message
-        message_without_options = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
-        message_without_options = message_without_options.strip()
-
-        return message_without_options, options
-
-    return text, []
-
-def display_message_with_options(content, message_idx):
+def display_message_with_options(message, message_idx):
     """Display a message and its quiz options as buttons"""
-    message_text, options = parse_options(content)
+    # Options were parsed once, when the message was added
+    message_text, options = message.text, message.options
 
     # Display the message text
     st.markdown(message_text)
@@ -107,13 +83,22 @@ def display_message_with_options(content, message_idx):
                 st.session_state.pending_input = f"{letter}) {option_text}"
                 st.rerun()
 
-# Initialize chat bot
-if "chatBot" not in st.session_state:
-    st.session_state.chatBot = LMMentorBot()
+def chat_bot():
+    """The session's chat bot, created the first time a file or message needs it"""
+    if "chatBot" not in st.session_state:
+        # Imported here so the page renders before LangChain, Anthropic,
+        # Chroma and pypdf have loaded
+        from chat_responses import LMMentorBot
+        st.session_state.chatBot = LMMentorBot()
+    return st.session_state.chatBot
+
+# Each browser session gets its own key in the shared history store
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 # Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+if "transcript" not in st.session_state:
+    st.session_state.transcript = Transcript()
 
 # Initialize pending input (for quiz button clicks)
 if "pending_input" not in st.session_state:
@@ -121,43 +106,129 @@ if "pending_input" not in st.session_state:
 
 # Sidebar for file upload
 with st.sidebar:
-    uploaded_file = st.file_uploader(
-        "Upload a file for context (PDF or TXT)",
+    uploaded_files = st.file_uploader(
+        "Upload files for context (PDF or TXT)",
         type=["pdf", "txt"],
-        help="Upload a file to provide context for our conversation. Conmodus will use this information to provide more relevant responses."
+        accept_multiple_files=True,
+        help="Upload files to provide context for our conversation, e.g. an assignment, its rubric and test cases. Conmodus will use this information to provide more relevant responses."
     )
 
-    if uploaded_file and "file_processed" not in st.session_state:
-        with st.spinner("Processing file..."):
-            response = st.session_state.chatBot.upload_file(uploaded_file)
-            st.sidebar.success(response)
-            st.session_state.file_processed = True
-
-    if "file_processed" in st.session_state:
-        st.sidebar.info(f"Currently using: {uploaded_file.name}")
-        if st.sidebar.button("Remove File Context"):
-            st.session_state.chatBot.reset()
-            del st.session_state.file_processed
+    # Names of the files currently attached to the bot's document set
+    if "processed_files" not in st.session_state:
+        st.session_state.processed_files = set()
+    # Files removed with the button while still listed in the uploader
+    if "removed_files" not in st.session_state:
+        st.session_state.removed_files = set()
+
+    # Background ingestion jobs by file name
+    if "ingestion_jobs" not in st.session_state:
+        st.session_state.ingestion_jobs = {}
+    jobs = st.session_state.ingestion_jobs
+    # Uploads that failed or were cancelled, by file name, until retried or removed
+    if "failed_files" not in st.session_state:
+        st.session_state.failed_files = {}
+    failed = st.session_state.failed_files
+
+    # Only new files are processed; files already added stay as they are.
+    # Processing runs in the background, so chat stays available meanwhile.
+    current_names = {f.name for f in uploaded_files or []}
+    st.session_state.removed_files &= current_names
+    for file_name in set(failed) - current_names:
+        del failed[file_name]
+    for uploaded_file in uploaded_files or []:
+        if uploaded_file.name not in st.session_state.processed_files | st.session_state.removed_files | set(failed):
+            jobs[uploaded_file.name] = chat_bot().start_upload(uploaded_file)
+            st.session_state.processed_files.add(uploaded_file.name)
+
+    def remove_file(file_name):
+        job = jobs.pop(file_name, None)
+        if job is not None:
+            job.cancel()
+        st.session_state.processed_files.discard(file_name)
+        return chat_bot().remove_file(file_name)
+
+    # Files cleared from the uploader are detached from the context
+    for file_name in sorted(st.session_state.processed_files - current_names):
+        remove_file(file_name)
+
+    # Set before a rerun, shown once after it
+    removed_message = st.session_state.pop("removed_message", None)
+    if removed_message:
+        st.sidebar.success(removed_message)
+    for message in st.session_state.pop("upload_toasts", []):
+        st.toast(message)
+
+    for file_name in sorted(st.session_state.processed_files):
+        st.sidebar.info(f"Currently using: {file_name}")
+        if st.sidebar.button("Remove", key=f"remove_{file_name}"):
+            st.session_state.removed_message = remove_file(file_name)
+            st.session_state.removed_files.add(file_name)
+            st.rerun()
+
+    for file_name, error in sorted(failed.items()):
+        st.sidebar.error(f"{file_name}: {error}")
+        retry_column, remove_column = st.sidebar.columns(2)
+        if retry_column.button("Retry", key=f"retry_{file_name}"):
+            # Picked up again as a new file on the rerun
+            del failed[file_name]
+            st.rerun()
+        if remove_column.button("Remove", key=f"remove_failed_{file_name}"):
+            del failed[file_name]
+            st.session_state.removed_message = chat_bot().remove_file(file_name)
+            st.session_state.removed_files.add(file_name)
+            st.rerun()
+
+    # Only scheduled while something is processing; finishing a job reruns
+    # the whole page, which drops the schedule once the last one is done
+    @st.fragment(run_every=1 if jobs else None)
+    def ingestion_progress():
+        """Refreshes on its own while files are processed, without rerunning the chat"""
+        finished = False
+        for file_name, job in list(jobs.items()):
+            progress = job.progress()
+            if job.status == "queued":
+                st.caption(f"{file_name}: waiting for a free processing slot")
+            elif job.status == "running":
+                chunks, embedded = progress.get("chunks", 0), progress.get("embedded", 0)
+                st.caption(f"{file_name}: {progress.get('pages', 0)} pages read, {embedded}/{chunks} chunks indexed")
+                st.progress(min(1.0, embedded / chunks) if chunks else 0.0)
+                if st.button("Cancel", key=f"cancel_{job.id}"):
+                    job.cancel()
+            else:
+                if job.status == "done":
+                    st.session_state.setdefault("upload_toasts", []).append(
+                        f"Successfully processed {file_name}. Ready for context-aware responses!"
+                    )
+                else:
+                    failed[file_name] = progress.get("error") or job.status
+                    st.session_state.processed_files.discard(file_name)
+                jobs.pop(file_name)
+                finished = True
+        if finished:
             st.rerun()
 
+    ingestion_progress()
+
 # Main chat interface
 chat_container = st.container()
 
-# Display chat messages
+# Display chat messages; only the newest window is drawn on each rerun
+transcript = st.session_state.transcript
 with chat_container:
-    for idx, message in enumerate(st.session_state.messages):
-        with st.chat_message(message["role"]):
-            if message["role"] == "assistant":
-                # Check if this is the last assistant message (show interactive buttons)
-                is_last_assistant = idx == len(st.session_state.messages) - 1
-                if is_last_assistant:
-                    display_message_with_options(message["content"], idx)
-                else:
-                    # For older messages, just show text without options block
-                    text_only, _ = parse_options(message["content"])
-                    st.markdown(text_only)
+    if transcript.hidden:
+        if st.button(f"Show earlier messages ({transcript.hidden} hidden)"):
+            transcript.show_earlier()
+            st.rerun()
+
+    last_idx = len(transcript) - 1
+    for idx, message in transcript.window():
+        with st.chat_message(message.role):
+            # Check if this is the last assistant message (show interactive buttons)
+            if message.role == "assistant" and idx == last_idx:
+                display_message_with_options(message, idx)
             else:
-                st.markdown(message["content"])
+                # For older messages, just show text without options block
+                st.markdown(message.text)
 
 # Handle pending input from quiz button click
 if st.session_state.pending_input:
@@ -170,11 +241,11 @@ if st.session_state.pending_input:
 
     # Get and display assistant response
     with st.chat_message("assistant"):
-        response = st.session_state.chatBot.chat_stream(pending)
+        response = chat_bot().chat_stream(pending, st.session_state.session_id)
 
     # Store messages
-    st.session_state.messages.append({"role": "user", "content": pending})
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    transcript.append("user", pending)
+    transcript.append("assistant", response)
     st.rerun()
 
 # Chat input
@@ -185,11 +256,11 @@ if prompt := st.chat_input("What would you like to learn about?"):
 
     # Get and display assistant response
     with st.chat_message("assistant"):
-        response = st.session_state.chatBot.chat_stream(prompt)
+        response = chat_bot().chat_stream(prompt, st.session_state.session_id)
 
     # Store messages
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    transcript.append("user", prompt)
+    transcript.append("assistant", response)
     st.rerun()
 
 
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+import chromadb
+from chromadb.config import Settings
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+
+CHROMA_PATH = "./chroma_db"
+MANIFEST_NAME = "documents.json"
+
+
+@lru_cache(maxsize=None)
+def chroma_client(path: str = CHROMA_PATH):
+    """Process-wide persistent Chroma client for a given directory"""
+    return chromadb.PersistentClient(
+        path=path,
+        settings=Settings(anonymized_telemetry=False)
+    )
+
+
+def document_key(data: bytes) -> str:
+    """Content hash that identifies an uploaded document"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DocumentRegistry:
+    """
+    Registry of uploaded documents and their persisted Chroma collections.
+
+    Documents are keyed by the sha256 of their bytes. Each document gets its
+    own collection under ./chroma_db, recorded in a small JSON manifest once
+    it has been fully embedded, so re-uploading a known file attaches the
+    existing collection instead of extracting and embedding it again.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        embedding_model: str,
+        path: str = CHROMA_PATH,
+        dimension: Optional[int] = None,
+    ):
+        self.embeddings = embeddings
+        self.embedding_model = embedding_model
+        self.dimension = dimension
+        self.path = path
+        self.manifest_path = os.path.join(path, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.client = chroma_client(path)
+
+    def _read_manifest(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest: Dict[str, Dict]) -> None:
+        # Write to a temp file first so a crash never leaves a torn manifest
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def collection_name(self, key: str) -> str:
+        """Collections are per (embedding model, document) pair"""
+        digest = hashlib.sha256(f"{self.embedding_model}:{key}".encode("utf-8")).hexdigest()
+        return f"doc_{digest[:40]}"
+
+    def _open(self, key: str) -> Chroma:
+        metadata = {"embedding_model": self.embedding_model}
+        if self.dimension:
+            metadata["dimension"] = self.dimension
+        return Chroma(
+            collection_name=self.collection_name(key),
+            embedding_function=self.embeddings,
+            client=self.client,
+            collection_metadata=metadata
+        )
+
+    def _check_compatible(self, collection) -> None:
+        """Refuse to attach a collection built in a different vector space"""
+        metadata = collection.metadata or {}
+        model = metadata.get("embedding_model")
+        dimension = metadata.get("dimension")
+        if model and model != self.embedding_model:
+            raise ValueError(
+                f"Collection {collection.name} was embedded with {model}, not {self.embedding_model}"
+            )
+        if dimension and self.dimension and dimension != self.dimension:
+            raise ValueError(
+                f"Collection {collection.name} has {dimension}-dimensional vectors, "
+                f"but the embedding backend produces {self.dimension}"
+            )
+
+    def get(self, key: str) -> Optional[Chroma]:
+        """Return the persisted store for a document, or None if it has not been embedded"""
+        with self._lock:
+            entry = self._read_manifest().get(self.collection_name(key))
+        if not entry:
+            return None
+        try:
+            collection = self.client.get_collection(self.collection_name(key))
+        except Exception:
+            # The manifest outlived its collection (e.g. chroma_db was reset)
+            return None
+        self._check_compatible(collection)
+        return self._open(key)
+
+    def open_new(self, key: str) -> Chroma:
+        """Return an empty persisted store for a document that is about to be embedded"""
+        name = self.collection_name(key)
+        try:
+            # Drop any partial collection left behind by an interrupted upload
+            self.client.delete_collection(name)
+        except Exception:
+            pass
+        return self._open(key)
+
+    def register(self, key: str, source: str, chunks: int) -> None:
+        """Mark a document's collection as complete in the manifest"""
+        with self._lock:
+            manifest = self._read_manifest()
+            manifest[self.collection_name(key)] = {
+                "document_key": key,
+                "source": source,
+                "chunks": chunks,
+                "embedding_model": self.embedding_model,
+                "dimension": self.dimension,
+                "created_at": time.time(),
+            }
+            self._write_manifest(manifest)
@@ -0,0 +1,122 @@
+import heapq
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from ingest_pipeline import Ingestion
+from lexical_index import fused_scores
+
+
+class AttachedDocument:
+    __slots__ = ("key", "source", "ingestion", "vector_store", "lexical_index")
+
+    def __init__(self, key: str, source: str, ingestion: Ingestion):
+        self.key = key
+        self.source = source
+        self.ingestion = ingestion
+        self.vector_store = ingestion.vector_store
+        self.lexical_index = ingestion.lexical_index
+
+
+class DocumentSet:
+    """
+    The documents one session's answers are grounded in.
+
+    Every document keeps its own persisted collection and BM25 index, which
+    other sessions may share, so adding a document attaches those and
+    removing one detaches them: nothing is re-embedded or deleted. Searches
+    embed the query once and run it against each attached collection.
+
+    Stands in for both the vector store and the lexical index of a
+    HybridRetriever, so one retriever (and one chain) serves every change.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self._documents: "OrderedDict[str, AttachedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, source: str, ingestion: Ingestion) -> None:
+        """
+        Attach a document; a new upload of the same file name replaces the old one.
+
+        The ingestion may still be running, in which case searches see the
+        chunks embedded so far.
+        """
+        document = AttachedDocument(ingestion.key, source, ingestion)
+        with self._lock:
+            for key in [k for k, d in self._documents.items() if d.source == source]:
+                del self._documents[key]
+            self._documents[document.key] = document
+
+    def remove(self, source: str) -> bool:
+        """Detach every document uploaded under a file name"""
+        with self._lock:
+            keys = [k for k, d in self._documents.items() if d.source == source]
+            for key in keys:
+                del self._documents[key]
+        return bool(keys)
+
+    def detach(self, key: str) -> None:
+        with self._lock:
+            self._documents.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._documents.clear()
+
+    def _snapshot(self) -> List[AttachedDocument]:
+        with self._lock:
+            return list(self._documents.values())
+
+    def keys(self) -> List[str]:
+        return [document.key for document in self._snapshot()]
+
+    def sources(self) -> List[str]:
+        return [document.source for document in self._snapshot()]
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @property
+    def indexing(self) -> bool:
+        """Whether any attached document is still being ingested"""
+        return any(not document.ingestion.done for document in self._snapshot())
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Document]:
+        """Nearest chunks across all attached collections"""
+        documents = self._snapshot()
+        if not documents:
+            return []
+        vector = self.embeddings.embed_query(query)
+        results: List[Tuple[Document, float]] = []
+        for document in documents:
+            results.extend(
+                document.vector_store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filter)
+            )
+        # Same embedding space, so distances compare across collections
+        return [doc for doc, _ in heapq.nsmallest(k, results, key=lambda item: item[1])]
+
+    def search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """
+        Top BM25 matches across all attached documents.
+
+        BM25 scores depend on each index's own statistics and don't compare
+        across documents, so the per-document rankings are fused by rank.
+        """
+        rankings = [
+            [doc for doc, _ in document.lexical_index.search(query, k, filter=filter)]
+            for document in self._snapshot()
+            if document.lexical_index is not None
+        ]
+        return fused_scores(rankings)[:k]
+
+    def facet(self, field: str) -> Dict[str, int]:
+        counts: Counter = Counter()
+        for document in self._snapshot():
+            if document.lexical_index is not None:
+                counts.update(document.lexical_index.facet(field))
+        return dict(counts)
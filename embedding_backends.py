@@ -0,0 +1,163 @@
+"""
+Registry of embedding backends selectable by name.
+
+Every backend declares the dimension of the vectors it produces, and
+collections are named and tagged by backend, so vectors from different
+backends can never end up in the same collection.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings
+from embedding_client import EmbeddingExecutor
+
+
+class EmbeddingBackend:
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        dimension: int,
+        factory: Callable[..., Embeddings],
+        remote: bool = True,
+        secret_names: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.model = model
+        self.dimension = dimension
+        self.factory = factory
+        self.remote = remote
+        self.secret_names = secret_names
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vector space, for cache keys and collection names"""
+        return f"{self.name}:{self.model}:{self.dimension}"
+
+
+_BACKENDS: Dict[str, EmbeddingBackend] = {}
+
+
+def register_backend(
+    name: str,
+    model: str,
+    dimension: int,
+    remote: bool = True,
+    secret_names: Tuple[str, ...] = (),
+):
+    """Decorator registering a factory(api_key) -> Embeddings under a name"""
+    def decorator(factory: Callable[..., Embeddings]):
+        _BACKENDS[name] = EmbeddingBackend(name, model, dimension, factory, remote, secret_names)
+        return factory
+    return decorator
+
+
+def available_backends() -> List[str]:
+    return sorted(_BACKENDS)
+
+
+def get_backend(name: str) -> EmbeddingBackend:
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown embedding backend '{name}'. Available: {', '.join(available_backends())}"
+        )
+
+
+def build_embeddings(name: str, api_key: Optional[str] = None, **executor_options) -> Embeddings:
+    """
+    Create the embeddings for a backend. Remote backends are wrapped in the
+    rate-limited executor and the persistent embedding cache; executor_options
+    (e.g. requests_per_second, query_requests_per_second) go to the executor.
+    """
+    backend = get_backend(name)
+    embeddings = backend.factory(api_key)
+    if not backend.remote:
+        return embeddings
+    return CachedEmbeddings(
+        EmbeddingExecutor(embeddings, name=backend.name, **executor_options),
+        model_name=backend.model_id
+    )
+
+
+@register_backend("google", "models/embedding-001", 768, secret_names=("GEMINI_API_KEY",))
+def _google(api_key: Optional[str]) -> Embeddings:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=api_key)
+
+
+@register_backend("openai", "text-embedding-ada-002", 1536, secret_names=("OPENAI_API_KEY",))
+def _openai(api_key: Optional[str]) -> Embeddings:
+    from langchain_community.embeddings import OpenAIEmbeddings
+    return OpenAIEmbeddings(openai_api_key=api_key)
+
+
+@register_backend("voyage", "voyage-large-2-instruct", 1024, secret_names=("VOYAGEAI_KEY",))
+def _voyage(api_key: Optional[str]) -> Embeddings:
+    from langchain_voyageai import VoyageAIEmbeddings
+
+    class VoyageEmbeddings(VoyageAIEmbeddings):
+        def embed_queries(self, texts: List[str]) -> List[List[float]]:
+            """Several queries per request, embedded with the query input type"""
+            vectors: List[List[float]] = []
+            for i in range(0, len(texts), self.batch_size):
+                vectors.extend(self._client.embed(
+                    texts[i:i + self.batch_size], model=self.model, input_type="query", truncation=self.truncation
+                ).embeddings)
+            return vectors
+
+    return VoyageEmbeddings(voyage_api_key=api_key, model="voyage-large-2-instruct")
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Local CPU embedder: signed feature hashing of character n-grams.
+
+    N-gram hashes are computed for the whole text at once with NumPy rolling
+    arithmetic and bucketed with bincount, so thousands of chunks per second
+    can be embedded without any network round trip. Quality is well below a
+    neural model, but good enough for offline use, tests and benchmarks.
+    """
+
+    def __init__(self, dimension: int = 512, ngram_sizes: Sequence[int] = (3, 4, 5)):
+        self.dimension = dimension
+        self.ngram_sizes = tuple(ngram_sizes)
+
+    def _embed(self, text: str) -> List[float]:
+        normalized = " ".join(text.lower().split())
+        data = np.frombuffer(f" {normalized} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        vector = np.zeros(self.dimension, dtype=np.float64)
+
+        for n in self.ngram_sizes:
+            if len(data) < n:
+                continue
+            # Polynomial hash of every n-gram, then a multiplicative mix
+            hashes = np.zeros(len(data) - n + 1, dtype=np.uint64)
+            for offset in range(n):
+                hashes = hashes * np.uint64(1099511628211) + data[offset:len(data) - n + 1 + offset]
+            hashes = (hashes ^ (hashes >> np.uint64(29))) * np.uint64(0x9E3779B97F4A7C15)
+            hashes ^= np.uint64(n)
+            buckets = (hashes % np.uint64(self.dimension)).astype(np.int64)
+            signs = np.where((hashes >> np.uint64(63)) == 1, -1.0, 1.0)
+            vector += np.bincount(buckets, weights=signs, minlength=self.dimension)
+
+        # Damp frequent n-grams and project onto the unit sphere
+        vector = np.sign(vector) * np.sqrt(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+@register_backend("local-hash", "char-ngram-3-5", 512, remote=False)
+def _local_hash(api_key: Optional[str]) -> Embeddings:
+    return HashedNgramEmbeddings(dimension=512)
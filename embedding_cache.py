@@ -0,0 +1,160 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_CACHE_PATH = "./embedding_cache.sqlite3"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed embedding cache in front of another Embeddings object.
+
+    Vectors are stored in a local SQLite file keyed by (model, sha256 of the
+    chunk text), so the same course documents uploaded by different students
+    are only embedded once. Least recently used rows are evicted once the
+    cache holds more than max_entries vectors.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        path: str = DEFAULT_CACHE_PATH,
+        max_entries: int = 200_000,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Fetch cached vectors for the given hashes and refresh their LRU stamp"""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = self._unpack(blob)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, self.model_name, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """Insert new vectors and evict the least recently used overflow"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(self.model_name, h, self._pack(v), now) for h, v in items.items()],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, sending only cache misses to the wrapped provider"""
+        hashes = [self._hash(text) for text in texts]
+        cached = self._lookup(hashes)
+
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are rarely repeated verbatim, so they bypass the cache"""
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        batch = getattr(self.embeddings, "embed_queries", None)
+        if batch is None:
+            return [self.embeddings.embed_query(text) for text in texts]
+        return batch(texts)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Return hit/miss counters for the lifetime of this object"""
+        with self._lock:
+            total = self.hits + self.misses
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+                "entries": entries,
+            }
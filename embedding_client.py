@@ -0,0 +1,234 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens from the bucket and return how long we waited for them"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(name: str, rate: float, capacity: Optional[float] = None) -> TokenBucket:
+    """Process-wide bucket per provider, shared by every session's embedder"""
+    with _buckets_lock:
+        if name not in _buckets:
+            _buckets[name] = TokenBucket(rate, capacity)
+        return _buckets[name]
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Best-effort detection of 429 / quota errors across provider SDKs"""
+    for attr in ("status_code", "code", "http_status"):
+        value = getattr(error, attr, None)
+        if value == 429 or getattr(value, "value", None) == 429:
+            return True
+    message = str(error).lower()
+    return any(term in message for term in ("429", "rate limit", "resource exhausted", "resourceexhausted", "quota"))
+
+
+class EmbeddingMetrics:
+    """Rolling per-call latency and throttling counters"""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.texts = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, texts: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.texts += texts
+            self.latencies.append(latency)
+
+    def add(self, counter: str, amount: float = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            calls, texts = self.calls, self.texts
+            throttled, retries, waited = self.throttled, self.retries, self.wait_seconds
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "calls": calls,
+            "texts": texts,
+            "throttled": throttled,
+            "retries": retries,
+            "rate_limit_wait_seconds": waited,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+
+class EmbeddingExecutor(Embeddings):
+    """
+    Concurrent, rate-limited and adaptively batched wrapper for any Embeddings.
+
+    Batches are sent concurrently up to max_concurrency. The batch size grows
+    while calls finish under target_latency and shrinks when they run slow or
+    the provider answers 429, in which case the batch is retried with
+    exponential backoff. All executors for the same provider name share one
+    token bucket, so the rate limit holds across every session in the process.
+
+    Queries get a bucket of their own, so a chat turn's query embedding never
+    queues behind an upload's document batches. Keep the two rates together
+    under the provider's limit.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        name: str,
+        requests_per_second: float = 3.0,
+        query_requests_per_second: float = 2.0,
+        max_concurrency: int = 4,
+        batch_size: int = 64,
+        min_batch_size: int = 8,
+        max_batch_size: int = 256,
+        target_latency: float = 2.0,
+        max_retries: int = 5,
+        base_backoff: float = 1.0,
+    ):
+        self.embeddings = embeddings
+        self.name = name
+        self.bucket = shared_bucket(name, requests_per_second)
+        self.query_bucket = shared_bucket(f"{name}:query", query_requests_per_second)
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.metrics = EmbeddingMetrics()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"embed-{name}")
+        self._query_pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"embed-query-{name}")
+
+    def _adapt(self, latency: float, size: int, throttled: bool) -> None:
+        with self._lock:
+            if throttled:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            elif latency > self.target_latency:
+                self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
+            elif size >= self.batch_size:
+                # Only grow when a full batch came back comfortably fast
+                self.batch_size = min(self.max_batch_size, int(self.batch_size * 1.25) + 1)
+
+    def _call(self, fn, texts: List[str], bucket: Optional[TokenBucket] = None):
+        bucket = bucket or self.bucket
+        attempt = 0
+        while True:
+            self.metrics.add("wait_seconds", bucket.acquire())
+            start = time.monotonic()
+            try:
+                result = fn(texts)
+            except Exception as e:
+                throttled = is_rate_limited(e)
+                if throttled:
+                    self.metrics.add("throttled")
+                    self._adapt(0.0, len(texts), throttled=True)
+                    if len(texts) > self.batch_size:
+                        # Re-send as smaller batches rather than retrying the same size
+                        size = self.batch_size
+                        result = []
+                        for i in range(0, len(texts), size):
+                            result.extend(self._call(fn, texts[i:i + size], bucket))
+                        return result
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.metrics.add("retries")
+                delay = self.base_backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+                logger.warning("%s embedding call failed (%s), retrying in %.1fs", self.name, e, delay)
+                time.sleep(delay)
+                continue
+
+            latency = time.monotonic() - start
+            self.metrics.record(latency, len(texts))
+            self._adapt(latency, len(texts), throttled=False)
+            return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in concurrent batches sized from recent latency"""
+        if not texts:
+            return []
+
+        size = self.batch_size
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        if len(batches) == 1:
+            return self._call(self.embeddings.embed_documents, batches[0])
+
+        futures = [
+            self._pool.submit(self._call, self.embeddings.embed_documents, batch)
+            for batch in batches
+        ]
+        vectors: List[List[float]] = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(lambda texts: self.embeddings.embed_query(texts[0]), [text], self.query_bucket)
+
+    def _embed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        batch = getattr(self.embeddings, "embed_queries", None)
+        if batch is not None:
+            return batch(texts)
+        # The provider has no batch call for queries: send them together instead
+        return list(self._query_pool.map(self.embeddings.embed_query, texts))
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries as queries, taking one rate-limit token per batch"""
+        if not texts:
+            return []
+        size = self.batch_size
+        vectors: List[List[float]] = []
+        for i in range(0, len(texts), size):
+            vectors.extend(self._call(self._embed_query_batch, texts[i:i + size], self.query_bucket))
+        return vectors
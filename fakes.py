@@ -0,0 +1,206 @@
+"""
+Local stand-ins for the hosted model APIs, for tests, benchmarks and load runs
+that must not spend real API budget.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeRateLimitError(Exception):
+    """Raised by the fakes to simulate an HTTP 429 from a provider"""
+
+    status_code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embedder with configurable latency and throttling.
+
+    Each call sleeps for latency + per_text_latency * len(texts). When
+    max_batch_size is set, larger batches are rejected with a 429, and
+    throttle_rate rejects that fraction of calls at random.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        latency: float = 0.0,
+        per_text_latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_batch_size: int = 0,
+        seed: int = 0,
+    ):
+        self.dimension = dimension
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.throttle_rate = throttle_rate
+        self.max_batch_size = max_batch_size
+        self.calls = 0
+        self.texts = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        # Seed a PRNG from the text so equal texts always get equal vectors
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimension)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _simulate(self, count: int) -> None:
+        with self._lock:
+            self.calls += 1
+            throttled = (
+                (self.max_batch_size and count > self.max_batch_size)
+                or self._random.random() < self.throttle_rate
+            )
+        if throttled:
+            raise FakeRateLimitError("429 Too Many Requests")
+        delay = self.latency + self.per_text_latency * count
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.texts += count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._simulate(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._simulate(1)
+        return self._vector(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that replays canned responses word by word.
+
+    first_token_latency is slept before the first token and token_latency
+    between tokens, in both the sync and async streaming paths.
+    """
+
+    responses: List[str] = ["This is a canned response from the fake chat model."]
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _next_tokens(self) -> List[str]:
+        response = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        return re.findall(r"\S+\s*", response) or [response]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._next_tokens()
+        time.sleep(self.first_token_latency + self.token_latency * len(tokens))
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for i, token in enumerate(self._next_tokens()):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for i, token in enumerate(self._next_tokens()):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class _FakeRequest:
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self):
+        return self._run()
+
+
+class FakeSheetsService:
+    """
+    In-memory stand-in for the Google Sheets API client.
+
+    Supports spreadsheets().values().append(...).execute() with a fixed
+    latency per call. The first fail_first calls and a random failure_rate
+    fraction of the rest raise a 429, to exercise retries.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, fail_first: int = 0, seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_first = fail_first
+        self.calls = 0
+        self.sheets = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def append(self, spreadsheetId: str, range: str, valueInputOption: str, body: dict):
+        def run():
+            with self._lock:
+                self.calls += 1
+                failed = self.calls <= self.fail_first or self._random.random() < self.failure_rate
+            if self.latency:
+                time.sleep(self.latency)
+            if failed:
+                raise FakeRateLimitError("429 Too Many Requests")
+            rows = body["values"]
+            with self._lock:
+                self.sheets.setdefault((spreadsheetId, range), []).extend(rows)
+            return {"updates": {"updatedRows": len(rows), "updatedCells": sum(len(row) for row in rows)}}
+        return _FakeRequest(run)
+
+    def rows(self, spreadsheet_id: str, range_name: str) -> List[List[Any]]:
+        with self._lock:
+            return list(self.sheets.get((spreadsheet_id, range_name), []))
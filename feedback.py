@@ -1,20 +1,33 @@
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google.oauth2.credentials import Credentials
+import atexit
 import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
 import streamlit as st
 
+logger = logging.getLogger(__name__)
+
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+SECRET_KEYS = ["token", "refresh_token", "token_uri", "client_id", "client_secret"]
+DEFAULT_SPOOL_PATH = "./feedback_spool.sqlite3"
 
-# Make Google feedback optional
-FEEDBACK_ENABLED = all(
-    st.secrets.get(key) for key in ["token", "refresh_token", "token_uri", "client_id", "client_secret"]
-)
 
-token_data = None
-json_data = None
+@lru_cache(maxsize=None)
+def feedback_credentials() -> Optional[dict]:
+    """Google authorized-user info from secrets, read on first use; None if not configured"""
+    # Make Google feedback optional
+    try:
+        if not all(st.secrets.get(key) for key in SECRET_KEYS):
+            return None
+    except Exception:
+        # No secrets file at all
+        return None
 
-if FEEDBACK_ENABLED:
     token_data = {
         "token": st.secrets["token"],
         "refresh_token": st.secrets["refresh_token"],
@@ -26,31 +39,320 @@ if FEEDBACK_ENABLED:
         "account": "",
         "expiry": "2024-08-06T08:36:06.391636Z",
     }
-    json_data = json.loads(json.dumps(token_data))
+    return json.loads(json.dumps(token_data))
 
-def append_values(spreadsheet_id, range_name, value_input_option, _values):
-    if not FEEDBACK_ENABLED:
-        print("Feedback disabled - Google secrets not configured")
-        return None
 
-    creds = Credentials.from_authorized_user_info(json_data)
+def feedback_enabled() -> bool:
+    return feedback_credentials() is not None
+
+
+def build_sheets_service():
+    """Sheets API client from the configured credentials"""
+    # The Google client libraries are slow to import; only load them when used
+    from googleapiclient.discovery import build
+    from google.oauth2.credentials import Credentials
+
+    creds = Credentials.from_authorized_user_info(feedback_credentials())
+    return build("sheets", "v4", credentials=creds, cache_discovery=False)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    # googleapiclient's HttpError carries the response; other clients a status_code
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "resp", None), "status", None)
     try:
-        service = build("sheets", "v4", credentials=creds)
-        body = {"values": _values}
-        result = (
-            service.spreadsheets()
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+# The API rejected the rows themselves: retrying the same rows won't help
+PAYLOAD_ERRORS = (400, 413, 422)
+# Credentials or sharing are wrong, not the rows; fixing them lets the rows through
+AUTH_ERRORS = (401, 403)
+
+
+def is_permanent(error: BaseException) -> bool:
+    return _status_code(error) in PAYLOAD_ERRORS
+
+
+def is_auth_error(error: BaseException) -> bool:
+    return _status_code(error) in AUTH_ERRORS
+
+
+Destination = Tuple[str, str, str]
+
+
+class FeedbackSpool:
+    """Durable queue of feedback rows waiting to be appended to a sheet"""
+
+    def __init__(self, path: str = DEFAULT_SPOOL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                spreadsheet_id TEXT NOT NULL,
+                range_name TEXT NOT NULL,
+                value_input_option TEXT NOT NULL,
+                row TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        # Rows the API rejected for good, kept for inspection instead of retried
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_rows (
+                id INTEGER PRIMARY KEY,
+                spreadsheet_id TEXT NOT NULL,
+                range_name TEXT NOT NULL,
+                value_input_option TEXT NOT NULL,
+                row TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                error TEXT NOT NULL,
+                failed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def put(self, spreadsheet_id: str, range_name: str, value_input_option: str, rows: List[List]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO rows (spreadsheet_id, range_name, value_input_option, row, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(spreadsheet_id, range_name, value_input_option, json.dumps(row), now) for row in rows],
+            )
+            self._conn.commit()
+
+    def destinations(self) -> List[Destination]:
+        """Destinations with spooled rows, the one waiting longest first"""
+        with self._lock:
+            return [
+                tuple(destination) for destination in self._conn.execute(
+                    "SELECT spreadsheet_id, range_name, value_input_option FROM rows "
+                    "GROUP BY spreadsheet_id, range_name, value_input_option ORDER BY MIN(id)"
+                )
+            ]
+
+    def take(self, destination: Destination, limit: int) -> Tuple[List[int], List[List]]:
+        """Oldest rows for one destination, as (ids, rows)"""
+        with self._lock:
+            records = self._conn.execute(
+                "SELECT id, row FROM rows WHERE spreadsheet_id = ? AND range_name = ? "
+                "AND value_input_option = ? ORDER BY id LIMIT ?",
+                (*destination, limit),
+            ).fetchall()
+        return [row_id for row_id, _ in records], [json.loads(row) for _, row in records]
+
+    def ack(self, ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM rows WHERE id = ?", [(row_id,) for row_id in ids])
+            self._conn.commit()
+
+    def retry(self, ids: List[int]) -> int:
+        """Count a failed attempt for these rows; returns the most attempts any has had"""
+        with self._lock:
+            self._conn.executemany("UPDATE rows SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+            (attempts,) = self._conn.execute(
+                f"SELECT MAX(attempts) FROM rows WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchone()
+        return attempts or 0
+
+    def dead_letter(self, ids: List[int], error: str) -> None:
+        """Move rows out of the queue into dead_rows"""
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dead_rows SELECT id, spreadsheet_id, range_name, value_input_option, "
+                f"row, created_at, attempts, ?, ? FROM rows WHERE id IN ({marks})",
+                [error, time.time(), *ids],
+            )
+            self._conn.execute(f"DELETE FROM rows WHERE id IN ({marks})", ids)
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()
+        return count
+
+    def dead_count(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM dead_rows").fetchone()
+        return count
+
+
+class FeedbackWriter:
+    """
+    Non-blocking feedback sink for Google Sheets.
+
+    submit() writes rows to the local spool and returns at once. A
+    background thread appends spooled rows in batches, one API call per
+    destination range, reusing a single Sheets client. Each destination is
+    flushed on its own, so one failing sheet doesn't hold up the others.
+    Rows the API rejects as malformed (400, 413, 422) are moved to the
+    spool's dead-letter table. Auth errors rebuild the client and retry
+    without counting against the rows, since fixing the credentials lets
+    them through. Other failures are retried with exponential backoff per
+    destination, up to max_attempts, so feedback survives a slow or
+    failing API and process restarts.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable = build_sheets_service,
+        spool: Optional[FeedbackSpool] = None,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        max_attempts: int = 8,
+    ):
+        self.service_factory = service_factory
+        self.spool = spool or FeedbackSpool()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._service = None
+        # Consecutive failures and next allowed attempt, per destination
+        self._failures: Dict[Destination, int] = {}
+        self._retry_at: Dict[Destination, float] = {}
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._stopped = threading.Event()
+        self._counters = {"submitted": 0, "appended": 0, "batches": 0, "errors": 0, "dead_lettered": 0}
+        self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, spreadsheet_id: str, range_name: str, value_input_option: str, rows: List[List]) -> None:
+        self.spool.put(spreadsheet_id, range_name, value_input_option, rows)
+        self._counters["submitted"] += len(rows)
+        self._idle.clear()
+        self._wake.set()
+
+    def _append(self, destination: Destination, rows: List[List]) -> None:
+        spreadsheet_id, range_name, value_input_option = destination
+        if self._service is None:
+            self._service = self.service_factory()
+        (
+            self._service.spreadsheets()
             .values()
             .append(
                 spreadsheetId=spreadsheet_id,
                 range=range_name,
                 valueInputOption=value_input_option,
-                body=body,
+                body={"values": rows},
             )
             .execute()
         )
-        print(f"{(result.get('updates').get('updatedCells'))} cells appended.")
-        return result
 
-    except HttpError as error:
-        print(f"An error occurred: {error}")
-        return error
+    def _failed(self, destination: Destination, ids: List[int], error: Exception) -> None:
+        self._counters["errors"] += 1
+        if is_permanent(error):
+            logger.warning("Feedback rows for %s rejected (%s); moved to dead letters", destination[1], error)
+            self.spool.dead_letter(ids, str(error))
+            self._counters["dead_lettered"] += len(ids)
+            return
+
+        # The client may be what's broken; build a fresh one next time
+        self._service = None
+        # An auth error isn't the rows' fault, so it doesn't count toward their attempts
+        if not is_auth_error(error) and self.spool.retry(ids) >= self.max_attempts:
+            logger.warning("Feedback append to %s failed %d times (%s); moved to dead letters",
+                           destination[1], self.max_attempts, error)
+            self.spool.dead_letter(ids, str(error))
+            self._counters["dead_lettered"] += len(ids)
+            self._failures.pop(destination, None)
+            return
+        failures = self._failures[destination] = self._failures.get(destination, 0) + 1
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (failures - 1))
+        self._retry_at[destination] = time.monotonic() + delay
+        if is_auth_error(error):
+            logger.error("Feedback append to %s not authorized (%s); check the service account, retrying in %.1fs",
+                         destination[1], error, delay)
+        else:
+            logger.warning("Feedback append to %s failed (%s); retrying in %.1fs", destination[1], error, delay)
+
+    def _flush_once(self) -> bool:
+        """Append one batch per ready destination; returns whether any got through"""
+        progressed = False
+        now = time.monotonic()
+        for destination in self.spool.destinations():
+            if self._retry_at.get(destination, 0.0) > now:
+                continue
+            ids, rows = self.spool.take(destination, self.batch_size)
+            try:
+                self._append(destination, rows)
+            except Exception as e:
+                self._failed(destination, ids, e)
+                continue
+            self.spool.ack(ids)
+            self._failures.pop(destination, None)
+            self._retry_at.pop(destination, None)
+            self._counters["appended"] += len(rows)
+            self._counters["batches"] += 1
+            progressed = True
+        return progressed
+
+    def _next_wait(self) -> float:
+        now = time.monotonic()
+        pending = [at - now for at in self._retry_at.values() if at > now]
+        return min([self.flush_interval] + pending)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+            try:
+                while self._flush_once():
+                    pass
+            except Exception as e:
+                # The spool itself failed; try again next round
+                logger.warning("Feedback flush failed: %s", e)
+            if self.spool.count() == 0:
+                self._idle.set()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the spool is drained; returns False on timeout"""
+        self._idle.clear()
+        self._wake.set()
+        return self._idle.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        self.flush(timeout)
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        return {**self._counters, "spooled": self.spool.count(), "dead": self.spool.dead_count()}
+
+
+@lru_cache(maxsize=None)
+def get_feedback_writer() -> FeedbackWriter:
+    """Process-wide feedback writer, flushed on exit"""
+    writer = FeedbackWriter()
+    atexit.register(writer.close)
+    return writer
+
+
+def append_values(spreadsheet_id, range_name, value_input_option, _values):
+    """Queue rows for appending to a sheet; returns immediately"""
+    if feedback_credentials() is None:
+        print("Feedback disabled - Google secrets not configured")
+        return None
+
+    get_feedback_writer().submit(spreadsheet_id, range_name, value_input_option, _values)
+    return {"queued": len(_values)}
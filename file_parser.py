@@ -1,6 +1,9 @@
 import os
+import re
 import tempfile
-from typing import Optional, Union, Dict
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple, Union, Dict
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
     PyPDFLoader, 
@@ -10,15 +13,45 @@ from langchain_community.document_loaders import (
     PythonLoader
 )
 from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from embedding_backends import build_embeddings, get_backend
+from document_registry import DocumentRegistry, document_key
+from pdf_pages import iter_page_text
+from ingest_pipeline import Ingestion, IngestionPipeline
+from lexical_index import BM25Index
+
+# Section headers that mark a part of a document as a different kind of material
+SECTION_TYPES = {
+    'rubric': re.compile(r"\b(rubric|grading|grade breakdown|point breakdown|evaluation criteria)\b", re.IGNORECASE),
+    'test_cases': re.compile(
+        r"\b(test cases?|testing|unit tests?|public tests?|autograder|sample (input|output))\b", re.IGNORECASE
+    ),
+}
 
 class FileParser:
-    def __init__(self, google_api_key: str):
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=google_api_key
-        )
+    def __init__(
+        self,
+        api_key: str = "",
+        embedding_backend: str = "google",
+        embeddings: Optional[Embeddings] = None,
+        embedding_model: str = "custom"
+    ):
+        dimension = None
+        if embeddings is None:
+            # Remote backends come wrapped in the rate-limited executor and
+            # the persistent cache, so only cache misses reach the provider
+            backend = get_backend(embedding_backend)
+            embeddings = build_embeddings(embedding_backend, api_key=api_key)
+            embedding_model = backend.model_id
+            dimension = backend.dimension
+        self.embeddings = embeddings
+        self.registry = DocumentRegistry(self.embeddings, embedding_model, dimension=dimension)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Ingestion] = {}
+        # BM25 indexes over recently used documents' chunks
+        self._lexical_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self.max_lexical_indexes = 64
         # Specific splitter for educational materials
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1500,
@@ -27,36 +60,49 @@ class FileParser:
             separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""],
             keep_separator=True
         )
+        # Extraction, splitting and embedding overlap as pipeline stages
+        self.pipeline = IngestionPipeline(self.text_splitter)
     
+    def _structure_page(self, text: str) -> Tuple[str, List[str]]:
+        """Format one page's text, returning it with the section headers found on it"""
+        # Preserve section headers and formatting
+        lines = text.split('\n')
+        formatted_lines = []
+        headers = []
+        for line in lines:
+            # Preserve bullet points and numbering
+            if line.strip().startswith(('•', '-', '*', '1.', '2.', '3.')):
+                formatted_lines.append('\n' + line)
+            # Preserve section headers (assuming they're in caps or followed by :)
+            elif line.isupper() or ':' in line:
+                formatted_lines.append('\n\n' + line + '\n')
+                header = line.strip().rstrip(':').strip()
+                # Only short lines are kept as section names, not "Due: Friday 5pm"
+                if header and len(header) <= 80 and (line.isupper() or line.rstrip().endswith(':')):
+                    headers.append(header)
+            else:
+                formatted_lines.append(line)
+
+        return ' '.join(formatted_lines), headers
+
+    def _iter_structured_pages(self, uploaded_file) -> Iterator[Tuple[str, List[str]]]:
+        # Use layout-preserved text extraction, parallelised across pages
+        for text in iter_page_text(uploaded_file):
+            yield self._structure_page(text)
+
+    def iter_structured_pdf(self, uploaded_file) -> Iterator[str]:
+        """
+        Yield structured text for each PDF page, in order, as pages are extracted
+        """
+        for text, _ in self._iter_structured_pages(uploaded_file):
+            yield text
+
     def extract_structured_pdf(self, uploaded_file) -> str:
         """
         Extract text from PDFs while preserving structure important for educational materials
         """
         try:
-            reader = PdfReader(uploaded_file)
-            structured_text = []
-            
-            for page in reader.pages:
-                # Use layout-preserved text extraction
-                text = page.extract_text(extraction_mode='layout')
-                
-                # Preserve section headers and formatting
-                lines = text.split('\n')
-                formatted_lines = []
-                for line in lines:
-                    # Preserve bullet points and numbering
-                    if line.strip().startswith(('•', '-', '*', '1.', '2.', '3.')):
-                        formatted_lines.append('\n' + line)
-                    # Preserve section headers (assuming they're in caps or followed by :)
-                    elif line.isupper() or ':' in line:
-                        formatted_lines.append('\n\n' + line + '\n')
-                    else:
-                        formatted_lines.append(line)
-                
-                structured_text.append(' '.join(formatted_lines))
-            
-            return '\n'.join(structured_text)
-
+            return '\n'.join(self.iter_structured_pdf(uploaded_file))
         except Exception as e:
             raise Exception(f"Error processing PDF: {str(e)}")
 
@@ -89,61 +135,144 @@ class FileParser:
         except Exception as e:
             raise Exception(f"Error processing test cases: {str(e)}")
 
-    def parse_file(self, uploaded_file) -> Union[Chroma, None]:
-        """Process uploaded file and create vector store for context"""
+    def _iter_pages(self, file_name: str, file_extension: str, data: bytes) -> Iterator[Document]:
+        """Yield one document per page (or per loaded record) of an uploaded file"""
+        material_type = self._determine_material_type(file_name)
+        if file_extension == '.pdf':
+            # PDFs are read straight from the in-memory upload
+            section = ""
+            pages = self._iter_structured_pages(data)
+            for page_number, (text, headers) in enumerate(pages):
+                # A page belongs to its first header, or to the section carried over
+                section = headers[0] if headers else section
+                yield Document(
+                    page_content=text,
+                    metadata={
+                        "source": file_name,
+                        "page": page_number,
+                        "section": section,
+                        "material_type": self._section_material_type(section, material_type),
+                    }  # Add metadata
+                )
+            return
+
+        loader_class = {
+            '.py': PythonLoader,
+            '.txt': TextLoader,
+            '.md': UnstructuredMarkdownLoader,
+            '.csv': CSVLoader
+        }[file_extension]
+
+        # The LangChain loaders need a path on disk
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, file_name)
+            with open(file_path, "wb") as f:
+                f.write(data)
+
+            loader = loader_class(file_path)
+            raw_documents = loader.load()
+
+        # Add metadata to each document
+        for doc in raw_documents:
+            doc.metadata["source"] = file_name
+            doc.metadata["material_type"] = material_type
+            yield doc
+
+    def _remember_lexical_index(self, key: str, index: BM25Index) -> None:
+        self._lexical_indexes[key] = index
+        self._lexical_indexes.move_to_end(key)
+        while len(self._lexical_indexes) > self.max_lexical_indexes:
+            self._lexical_indexes.popitem(last=False)
+
+    def lexical_index(self, key: str, vector_store: Chroma) -> BM25Index:
+        """BM25 index for a stored document, rebuilt from its chunks if not cached"""
+        with self._lock:
+            index = self._lexical_indexes.get(key)
+            if index is not None:
+                self._lexical_indexes.move_to_end(key)
+                return index
+
+        # No embedding calls needed: the chunk texts are already in Chroma
+        stored = vector_store.get(include=["documents", "metadatas"])
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(stored["documents"], stored["metadatas"])
+        ]
+        index = BM25Index.from_documents(documents, stored["ids"])
+        with self._lock:
+            self._remember_lexical_index(key, index)
+        return index
+
+    def start_ingestion(self, uploaded_file) -> Optional[Ingestion]:
+        """
+        Start extracting, splitting and embedding an uploaded file in the background.
+
+        The returned handle's vector store can be queried while batches are
+        still landing; previously seen documents come back already complete.
+        The caller holds the handle and must release() it when done waiting.
+        """
         if uploaded_file is None:
             return None
-        
+
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                file_path = os.path.join(temp_dir, uploaded_file.name)
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.getvalue())
-                
-                file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-                
-                # Initialize documents list
-                documents = []
-                
-                # Process different file types
-                if file_extension == '.pdf':
-                    text = self.extract_structured_pdf(uploaded_file)
-                    documents = self.text_splitter.create_documents(
-                        [text],
-                        metadatas=[{"source": uploaded_file.name}]  # Add metadata
-                    )
-                
-                elif file_extension in ['.py', '.txt', '.md', '.csv']:
-                    loader_class = {
-                        '.py': PythonLoader,
-                        '.txt': TextLoader,
-                        '.md': UnstructuredMarkdownLoader,
-                        '.csv': CSVLoader
-                    }[file_extension]
-                    
-                    loader = loader_class(file_path)
-                    raw_documents = loader.load()
-                    documents = self.text_splitter.split_documents(raw_documents)
-                    
-                    # Add metadata to each document
-                    for doc in documents:
-                        doc.metadata["source"] = uploaded_file.name
-                
-                else:
-                    raise ValueError("Unsupported file type. Please upload a PDF, Python, Markdown, TXT, or CSV file.")
+            file_extension = os.path.splitext(uploaded_file.name)[1].lower()
+            if file_extension not in ['.pdf', '.py', '.txt', '.md', '.csv']:
+                raise ValueError("Unsupported file type. Please upload a PDF, Python, Markdown, TXT, or CSV file.")
 
-                if not documents:
-                    raise ValueError("No content could be extracted from the file.")
+            # Previously seen documents reuse their persisted collection
+            data = uploaded_file.getvalue()
+            key = document_key(data)
+            vector_store = self.registry.get(key)
+            if vector_store is not None:
+                return Ingestion.completed(vector_store, self.lexical_index(key, vector_store), key)
 
-                # Create and return vector store
-                return Chroma.from_documents(
-                    documents=documents,
-                    embedding=self.embeddings
-                )
+            while True:
+                with self._lock:
+                    self._in_flight = {k: v for k, v in self._in_flight.items() if not v.done}
+                    ingestion = self._in_flight.get(key)
+                    if ingestion is None:
+                        def on_complete(chunks: int):
+                            self.registry.register(key, uploaded_file.name, chunks)
+
+                        lexical_index = BM25Index()
+                        self._remember_lexical_index(key, lexical_index)
+                        ingestion = self.pipeline.start(
+                            self._iter_pages(uploaded_file.name, file_extension, data),
+                            self.registry.open_new(key),
+                            id_prefix=key[:16],
+                            on_complete=on_complete,
+                            lexical_index=lexical_index,
+                            key=key
+                        )
+                        ingestion.acquire()
+                        self._in_flight[key] = ingestion
+                        return ingestion
+                    # Another session is already embedding this exact file
+                    if ingestion.acquire():
+                        return ingestion
+                # Its last waiter cancelled it; let it stop before starting over,
+                # since open_new drops the collection it is writing to
+                try:
+                    ingestion.wait()
+                except Exception:
+                    pass
 
         except Exception as e:
             raise Exception(f"Error processing file: {str(e)}")
 
+    def parse_file(self, uploaded_file) -> Union[Chroma, None]:
+        """Process uploaded file and create vector store for context"""
+        ingestion = self.start_ingestion(uploaded_file)
+        if ingestion is None:
+            return None
+
+        try:
+            return ingestion.wait()
+        except Exception as e:
+            raise Exception(f"Error processing file: {str(e)}")
+        finally:
+            ingestion.release()
+
     def get_metadata(self, file_path: str) -> Dict:
         """Extract metadata about the educational material"""
         try:
@@ -160,6 +289,13 @@ class FileParser:
         except Exception as e:
             return {"error": str(e)}
 
+    def _section_material_type(self, section: str, default: str) -> str:
+        """A section like "GRADING RUBRIC" inside a spec overrides the file's type"""
+        # Whole-word header phrases only; "PROJECT OVERVIEW" or "SPECIAL NOTES"
+        # say nothing about the material
+        matched = [material_type for material_type, pattern in SECTION_TYPES.items() if pattern.search(section)]
+        return matched[0] if len(matched) == 1 else default
+
     def _determine_material_type(self, file_name: str) -> str:
         """Determine the type of educational material based on filename"""
         file_name_lower = file_name.lower()
@@ -1,6 +1,6 @@
 import chromadb
 from chromadb.config import Settings
-from langchain_community.embeddings import OpenAIEmbeddings
+from embedding_backends import build_embeddings
 from langchain_chroma import Chroma
 import shutil
 import os
@@ -28,9 +28,7 @@ def reset_chroma():
         print("ChromaDB client initialized.")
 
         # Initialize embeddings using Streamlit secrets
-        embeddings = OpenAIEmbeddings(
-            openai_api_key=st.secrets["OPENAI_API_KEY"]
-        )
+        embeddings = build_embeddings("openai", api_key=st.secrets["OPENAI_API_KEY"])
         print("Embeddings initialized.")
 
         # Create new Chroma instance
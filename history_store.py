@@ -0,0 +1,261 @@
+import asyncio
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+
+DEFAULT_HISTORY_PATH = "./session_history.sqlite3"
+
+
+class HistoryBackend(ABC):
+    """Cold storage for chat histories that have been evicted from memory"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[List[BaseMessage]]:
+        ...
+
+    @abstractmethod
+    def save(self, session_id: str, messages: List[BaseMessage]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class SQLiteHistoryBackend(HistoryBackend):
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS histories (
+                session_id TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def load(self, session_id: str) -> Optional[List[BaseMessage]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT messages FROM histories WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return messages_from_dict(json.loads(row[0]))
+
+    def save(self, session_id: str, messages: List[BaseMessage]) -> None:
+        payload = json.dumps(messages_to_dict(messages))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO histories (session_id, messages, updated_at) VALUES (?, ?, ?)",
+                (session_id, payload, time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM histories WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM histories").fetchone()
+        return count
+
+
+class SessionHistory(BaseChatMessageHistory):
+    """
+    A session's chat history that reads and writes through the store.
+
+    Holds no messages itself, so a turn that is still running when its
+    session is spilled appends to the store, not to an orphaned copy.
+    """
+
+    def __init__(self, store: "SessionHistoryStore", session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return self.store.messages(self.session_id)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.append(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.replace(self.session_id, [])
+
+
+class SessionHistoryStore:
+    """
+    Bounded in-memory LRU of chat histories backed by a cold store.
+
+    At most max_hot histories stay in memory; sessions idle longer than
+    idle_timeout seconds, or pushed out by the LRU bound, are spilled to the
+    backend and loaded back lazily the next time they are asked for. A
+    background sweep spills idle sessions even when nothing is accessed.
+    Memory therefore scales with active users rather than every user ever
+    seen. Supports the dict operations LMMentorBot used on its plain dict store.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[HistoryBackend] = None,
+        max_hot: int = 500,
+        idle_timeout: float = 30 * 60,
+        sweep_interval: Optional[float] = None,
+    ):
+        self.backend = backend or SQLiteHistoryBackend()
+        self.max_hot = max_hot
+        self.idle_timeout = idle_timeout
+        self._hot: "OrderedDict[str, List[BaseMessage]]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.spills = 0
+        self._stopped = threading.Event()
+        self._sweeper = threading.Thread(
+            target=self._sweep,
+            args=(sweep_interval or min(60.0, idle_timeout / 2),),
+            name="history-sweep",
+            daemon=True,
+        )
+        self._sweeper.start()
+
+    def _entry(self, session_id: str) -> List[BaseMessage]:
+        # Caller holds the lock
+        messages = self._hot.get(session_id)
+        if messages is None:
+            loaded = self.backend.load(session_id)
+            if loaded is not None:
+                self.loads += 1
+            messages = self._hot[session_id] = loaded or []
+        self._hot.move_to_end(session_id)
+        self._last_used[session_id] = time.monotonic()
+        self._evict()
+        return messages
+
+    def get(self, session_id: str) -> SessionHistory:
+        """Return the history for a session, loading or creating it"""
+        with self._lock:
+            self._entry(session_id)
+        return SessionHistory(self, session_id)
+
+    def messages(self, session_id: str) -> List[BaseMessage]:
+        with self._lock:
+            return list(self._entry(session_id))
+
+    def append(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            self._entry(session_id).extend(messages)
+
+    def replace(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            self._entry(session_id)
+            self._hot[session_id] = list(messages)
+
+    def _spill(self, session_id: str) -> None:
+        messages = self._hot.pop(session_id)
+        self._last_used.pop(session_id, None)
+        if messages:
+            self.backend.save(session_id, messages)
+        self.spills += 1
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._hot:
+            session_id = next(iter(self._hot))
+            idle = now - self._last_used.get(session_id, now) > self.idle_timeout
+            if len(self._hot) <= self.max_hot and not idle:
+                break
+            self._spill(session_id)
+
+    def evict_idle(self) -> None:
+        """Spill idle sessions without waiting for the next access"""
+        with self._lock:
+            self._evict()
+
+    def _sweep(self, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception:
+                # The backend may be briefly unavailable; try again next sweep
+                pass
+
+    def close(self) -> None:
+        """Stop the idle sweep and persist every hot session"""
+        self._stopped.set()
+        self.flush()
+
+    def flush(self) -> None:
+        """Persist every hot session, e.g. before the process exits"""
+        with self._lock:
+            for session_id, messages in self._hot.items():
+                if messages:
+                    self.backend.save(session_id, messages)
+
+    def __getitem__(self, session_id: str) -> SessionHistory:
+        return self.get(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._hot or self.backend.load(session_id) is not None
+
+    def __delitem__(self, session_id: str) -> None:
+        with self._lock:
+            self._hot.pop(session_id, None)
+            self._last_used.pop(session_id, None)
+            self.backend.delete(session_id)
+
+    def __len__(self) -> int:
+        """Number of histories currently held in memory"""
+        with self._lock:
+            return len(self._hot)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hot": len(self._hot),
+                "cold": self.backend.count(),
+                "loads": self.loads,
+                "spills": self.spills,
+            }
+
+    async def aget(self, session_id: str) -> SessionHistory:
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def adelete(self, session_id: str) -> None:
+        await asyncio.to_thread(self.__delitem__, session_id)
+
+    async def aflush(self) -> None:
+        await asyncio.to_thread(self.flush)
+
+
+@lru_cache(maxsize=None)
+def get_history_store() -> SessionHistoryStore:
+    """Process-wide history store shared by every bot"""
+    store = SessionHistoryStore()
+    atexit.register(store.close)
+    return store
@@ -0,0 +1,155 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You maintain a running summary of a tutoring conversation between a student "
+     "and a Socratic mentor. Fold the new messages into the existing summary. Keep "
+     "the student's goals, what they have understood, open questions, quiz answers "
+     "and any code or assignment details. Be concise and use plain text."),
+    ("human", "Current summary:\n{summary}\n\nNew messages:\n{transcript}"),
+])
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) that needs no API call"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def message_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(estimate_tokens(str(message.content)) + 4 for message in messages)
+
+
+class HistoryCompactor:
+    """
+    Caps the chat history sent to the model.
+
+    The last max_turns turns are kept verbatim, trimmed further from the
+    oldest end until they fit token_budget. Everything older is folded into
+    a per-session summary that is updated on a background thread, so the
+    summarization call never delays a student's answer.
+    """
+
+    def __init__(
+        self,
+        llm,
+        max_turns: int = 6,
+        token_budget: int = 3000,
+        max_sessions: int = 10_000,
+    ):
+        self.summary_chain = SUMMARY_PROMPT | llm | StrOutputParser()
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        # session_id -> (summary text, number of messages it covers)
+        self._summaries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+    def _window(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        recent = messages[-2 * self.max_turns:] if self.max_turns else []
+        while recent and message_tokens(recent) > self.token_budget:
+            # Drop a whole turn at a time so the window starts on a human message
+            recent = recent[2:] if len(recent) > 1 else []
+        return recent
+
+    def _summarize(self, session_id: str, messages: List[BaseMessage], previous: str, covered: int) -> None:
+        try:
+            transcript = "\n".join(f"{m.type}: {m.content}" for m in messages[covered:])
+            summary = self.summary_chain.invoke({
+                "summary": previous or "(none yet)",
+                "transcript": transcript,
+            })
+            with self._lock:
+                self._summaries[session_id] = (summary, len(messages))
+                self._summaries.move_to_end(session_id)
+                while len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+        except Exception as e:
+            logger.warning("History summary for session %s failed: %s", session_id, e)
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def compact(self, messages: List[BaseMessage], session_id: str) -> List[BaseMessage]:
+        """Return the summary plus recent turns to send in place of the full history"""
+        recent = self._window(messages)
+        older = messages[:len(messages) - len(recent)]
+
+        with self._lock:
+            summary, covered = self._summaries.get(session_id, ("", 0))
+            stale = len(older) > covered and session_id not in self._pending
+            if stale:
+                self._pending.add(session_id)
+        if stale:
+            # Off the critical path: this turn uses the previous summary
+            self._executor.submit(self._summarize, session_id, list(older), summary, covered)
+
+        compacted = list(recent)
+        if summary:
+            # As a human/ai pair: Anthropic only accepts one leading system
+            # message, and the prompt's own system message comes first
+            compacted[:0] = [
+                HumanMessage(content=f"Summary of our earlier conversation: {summary}"),
+                AIMessage(content="Thanks, I'll keep that in mind."),
+            ]
+        return compacted
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._summaries.pop(session_id, None)
+
+    def runnable_step(self, base_prompt_tokens: int = 0):
+        """
+        Function for a RunnableLambda that replaces chat_history with its
+        compacted form and logs the resulting prompt size.
+        """
+        def compact_history(x: Dict, config) -> Dict:
+            session_id = config.get("configurable", {}).get("session_id", "default")
+            history = x.get("chat_history", [])
+            compacted = self.compact(history, session_id)
+            prompt_tokens = (
+                base_prompt_tokens + message_tokens(compacted) + estimate_tokens(x.get("input", ""))
+            )
+            logger.info(
+                "session=%s history_messages=%d sent_messages=%d prompt_tokens~%d",
+                session_id, len(history), len(compacted), prompt_tokens,
+            )
+            return {**x, "chat_history": compacted}
+
+        return compact_history
+
+
+if __name__ == "__main__":
+    # Long conversation through the real mentor prompt and Anthropic formatting
+    import time
+
+    from langchain_anthropic.chat_models import _format_messages
+
+    from fakes import FakeChatModel
+    from model_clients import default_template
+
+    compactor = HistoryCompactor(FakeChatModel(responses=["student is learning hash tables"]), max_turns=3)
+    history: List[BaseMessage] = []
+    for turn in range(10):
+        history += [HumanMessage(content=f"question {turn}"), AIMessage(content=f"answer {turn}")]
+        compacted = compactor.compact(history, "check")
+        time.sleep(0.05)
+
+    compacted = compactor.compact(history, "check")
+    assert isinstance(compacted[0], HumanMessage) and "hash tables" in compacted[0].content, compacted
+    messages = default_template().format_messages(input="and then?", context="", chat_history=compacted)
+    system, formatted = _format_messages(messages)
+    assert system and [m["role"] for m in formatted] == ["user", "assistant"] * 4 + ["user"], formatted
+    print(f"ok: {len(history)} messages sent as system + {len(formatted)} turns")
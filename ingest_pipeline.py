@@ -0,0 +1,257 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+
+_DONE = object()
+
+
+class IngestionCancelled(Exception):
+    pass
+
+
+class IngestionProgress:
+    """Counters updated by the pipeline stages as work completes"""
+
+    def __init__(self):
+        self.pages = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.started_at = time.monotonic()
+        self.first_batch_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "embedded": self.embedded,
+            "seconds_to_first_batch": (
+                self.first_batch_at - self.started_at if self.first_batch_at else None
+            ),
+            "seconds_total": (
+                self.finished_at - self.started_at if self.finished_at else None
+            ),
+        }
+
+
+class Ingestion:
+    """
+    Handle for a document being ingested into a vector store.
+
+    The vector store is usable as soon as the handle exists; it simply
+    returns more results as embedding batches land. Sessions uploading the
+    same file share one handle, each holding it through acquire/release;
+    the work is only cancelled once the last of them lets go.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        lexical_index=None,
+        key: Optional[str] = None,
+        progress: Optional[IngestionProgress] = None,
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.key = key
+        self.progress = progress or IngestionProgress()
+        self.error: Optional[BaseException] = None
+        self._done = threading.Event()
+        self._cancel = threading.Event()
+        self._waiters = 0
+        self._waiters_lock = threading.Lock()
+
+    @classmethod
+    def completed(cls, vector_store, lexical_index=None, key: Optional[str] = None) -> "Ingestion":
+        """Handle for a store that needs no further work"""
+        ingestion = cls(vector_store, lexical_index, key)
+        ingestion.progress.finished_at = ingestion.progress.started_at
+        ingestion._done.set()
+        return ingestion
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def acquire(self) -> bool:
+        """Register a waiter; False if the last one already cancelled it"""
+        with self._waiters_lock:
+            if self._cancel.is_set():
+                return False
+            self._waiters += 1
+            return True
+
+    def release(self) -> None:
+        """Drop a waiter, cancelling unfinished work if it was the last"""
+        with self._waiters_lock:
+            self._waiters = max(0, self._waiters - 1)
+            if self._waiters == 0 and not self.done:
+                self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until ingestion finishes and return the vector store"""
+        if not self._done.wait(timeout):
+            raise TimeoutError("Ingestion is still running")
+        if self.error is not None:
+            raise self.error
+        return self.vector_store
+
+
+class IngestionPipeline:
+    """
+    Extract -> split -> embed as concurrent stages joined by bounded queues.
+
+    Pages are split as soon as they are extracted and chunks are embedded in
+    batches while later pages are still in flight. The bounded queues give
+    backpressure, so memory stays flat however large the document is.
+    """
+
+    def __init__(self, text_splitter, batch_size: int = 64, queue_size: int = 4):
+        self.text_splitter = text_splitter
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+
+    def start(
+        self,
+        pages: Iterable[Document],
+        vector_store,
+        id_prefix: str,
+        on_complete: Optional[Callable[[int], None]] = None,
+        lexical_index=None,
+        key: Optional[str] = None,
+    ) -> Ingestion:
+        """Run the pipeline on a background thread and return its handle"""
+        ingestion = Ingestion(vector_store, lexical_index, key)
+        thread = threading.Thread(
+            target=self._run,
+            args=(ingestion, pages, id_prefix, on_complete),
+            daemon=True,
+        )
+        thread.start()
+        return ingestion
+
+    def _stopped(self, stop: threading.Event, ingestion: Ingestion) -> bool:
+        if ingestion.cancelled:
+            raise IngestionCancelled("Ingestion was cancelled")
+        return stop.is_set()
+
+    def _put(self, q: queue.Queue, item, stop: threading.Event, ingestion: Ingestion) -> None:
+        # Block for backpressure, but give up if cancelled or another stage has failed
+        while not self._stopped(stop, ingestion):
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise IngestionCancelled()
+
+    def _get(self, q: queue.Queue, stop: threading.Event, ingestion: Ingestion):
+        while not self._stopped(stop, ingestion):
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise IngestionCancelled()
+
+    def _extract(self, pages, page_queue, stop, ingestion, errors):
+        try:
+            for page in pages:
+                if not page.page_content.strip():
+                    continue
+                self._put(page_queue, page, stop, ingestion)
+                ingestion.progress.pages += 1
+            self._put(page_queue, _DONE, stop, ingestion)
+        except IngestionCancelled:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def _split(self, page_queue, batch_queue, stop, ingestion, errors):
+        try:
+            batch: List[Document] = []
+            while True:
+                page = self._get(page_queue, stop, ingestion)
+                if page is _DONE:
+                    break
+                for chunk in self.text_splitter.split_documents([page]):
+                    batch.append(chunk)
+                    ingestion.progress.chunks += 1
+                    if len(batch) >= self.batch_size:
+                        self._put(batch_queue, batch, stop, ingestion)
+                        batch = []
+            if batch:
+                self._put(batch_queue, batch, stop, ingestion)
+            self._put(batch_queue, _DONE, stop, ingestion)
+        except IngestionCancelled:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def _run(self, ingestion: Ingestion, pages, id_prefix, on_complete) -> None:
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        page_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        batch_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        stages = [
+            threading.Thread(
+                target=self._extract,
+                args=(pages, page_queue, stop, ingestion, errors),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._split,
+                args=(page_queue, batch_queue, stop, ingestion, errors),
+                daemon=True,
+            ),
+        ]
+        for stage in stages:
+            stage.start()
+
+        try:
+            # Embedding runs on this thread and is usually the slowest stage
+            while True:
+                # Also raises if cancelled while waiting for the next batch
+                batch = self._get(batch_queue, stop, ingestion)
+                if batch is _DONE:
+                    break
+                start = ingestion.progress.embedded
+                ids = [f"{id_prefix}:{start + i}" for i in range(len(batch))]
+                if ingestion.lexical_index is not None:
+                    # Lexical search can use the batch before its embeddings land
+                    ingestion.lexical_index.add(batch, ids)
+                ingestion.vector_store.add_documents(batch, ids=ids)
+                ingestion.progress.embedded += len(batch)
+                if ingestion.progress.first_batch_at is None:
+                    ingestion.progress.first_batch_at = time.monotonic()
+
+            if ingestion.progress.embedded == 0:
+                raise ValueError("No content could be extracted from the file.")
+            if on_complete is not None:
+                on_complete(ingestion.progress.embedded)
+
+        except IngestionCancelled as e:
+            ingestion.error = errors[0] if errors else e
+        except BaseException as e:
+            ingestion.error = e
+        finally:
+            stop.set()
+            # Extraction may be stuck inside a slow page; it only reads and
+            # exits at its next queue operation, so it isn't waited for
+            for stage in stages[1:]:
+                stage.join()
+            ingestion.progress.finished_at = time.monotonic()
+            ingestion._done.set()
@@ -0,0 +1,132 @@
+import itertools
+import logging
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from ingest_pipeline import Ingestion, IngestionCancelled
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_job_ids = itertools.count(1)
+
+
+class IngestionJob:
+    """An uploaded file waiting for, or going through, ingestion"""
+
+    def __init__(self, source: str):
+        self.id = next(_job_ids)
+        self.source = source
+        self.status = QUEUED
+        self.ingestion: Optional[Ingestion] = None
+        self.error: Optional[BaseException] = None
+        self.future: Optional[Future] = None
+        self._cancel = threading.Event()
+        self._released = False
+        self._release_lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self) -> None:
+        """
+        Drop a queued job or stop waiting on a running one.
+
+        Only this job is cancelled: an ingestion shared with other sessions'
+        jobs keeps going until the last of them lets go of it.
+        """
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.status = CANCELLED
+        else:
+            self._release()
+
+    def _release(self) -> None:
+        with self._release_lock:
+            if self.ingestion is None or self._released:
+                return
+            self._released = True
+        self.ingestion.release()
+
+    def wait(self, timeout: Optional[float] = None) -> "IngestionJob":
+        if self.future is not None:
+            try:
+                self.future.result(timeout)
+            except CancelledError:
+                pass
+        return self
+
+    def progress(self) -> Dict:
+        details = {"job": self.id, "source": self.source, "status": self.status}
+        # A cancelled job's ingestion may carry on for other sessions
+        if self.ingestion is not None and self.status != CANCELLED:
+            details.update(self.ingestion.progress.as_dict())
+        if self.error is not None:
+            details["error"] = str(self.error)
+        return details
+
+
+class IngestionJobManager:
+    """
+    Runs file ingestion in the background with a cap on concurrent jobs.
+
+    Uploads from every session share the same few slots, so a burst of
+    large files queues up instead of competing with chat for the embedding
+    provider and CPU. A job's partial index is handed to on_start as soon
+    as it begins, so the session can chat against it while it fills.
+    """
+
+    def __init__(self, file_parser, max_concurrent: int = 2):
+        self.file_parser = file_parser
+        self.max_concurrent = max_concurrent
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="ingestion-job")
+
+    def submit(
+        self,
+        uploaded_file,
+        on_start: Optional[Callable[[IngestionJob], None]] = None,
+        on_finish: Optional[Callable[[IngestionJob], None]] = None,
+    ) -> IngestionJob:
+        """Queue a file for ingestion and return its job"""
+        job = IngestionJob(uploaded_file.name)
+        job.future = self._executor.submit(self._run, job, uploaded_file, on_start, on_finish)
+        return job
+
+    def _run(self, job: IngestionJob, uploaded_file, on_start, on_finish) -> None:
+        if job._cancel.is_set():
+            job.status = CANCELLED
+            return
+        job.status = RUNNING
+        try:
+            job.ingestion = self.file_parser.start_ingestion(uploaded_file)
+            if on_start is not None:
+                on_start(job)
+            # Holds this slot until the pipeline finishes or this job is cancelled
+            while not job.ingestion.done:
+                if job._cancel.is_set():
+                    raise IngestionCancelled("Ingestion was cancelled")
+                job._cancel.wait(0.1)
+            job.ingestion.wait()
+            job.status = DONE
+        except IngestionCancelled as e:
+            job.error = e
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.status = FAILED
+            logger.warning("Ingestion of %s failed: %s", job.source, e)
+        finally:
+            job._release()
+        if on_finish is not None:
+            try:
+                on_finish(job)
+            except Exception as e:
+                logger.warning("Ingestion callback for %s failed: %s", job.source, e)
@@ -0,0 +1,241 @@
+import asyncio
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+(?:\.\d+)?")
+# Course codes like "EECS 281" or "MATH 214", also indexed as one token
+COURSE_CODE_PATTERN = re.compile(r"\b([A-Z]{2,8})\s?(\d{3})\b")
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hybrid-dense")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words, identifiers and their snake_case parts, and joined course codes"""
+    tokens = WORD_PATTERN.findall(text.lower())
+    if "_" in text:
+        tokens.extend(part for token in tokens if "_" in token for part in token.split("_") if part)
+    tokens.extend(f"{subject}{number}".lower() for subject, number in COURSE_CODE_PATTERN.findall(text))
+    return tokens
+
+
+def _matches(metadata: Dict, filter: Optional[Dict]) -> bool:
+    return not filter or all(metadata.get(key) == value for key, value in filter.items())
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over document chunks.
+
+    Queries only touch the postings of their own terms, so latency depends
+    on how common the query terms are rather than on the number of chunks.
+    Chunks can be added and removed by id, and the values of the metadata
+    fields listed in facets are counted so callers can see what is indexed.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, facets: Sequence[str] = ("material_type",)):
+        self.k1 = k1
+        self.b = b
+        self.facets = tuple(facets)
+        self._facet_counts: Dict[str, Counter] = {field: Counter() for field in self.facets}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._docs: Dict[int, Document] = {}
+        self._lengths: Dict[int, int] = {}
+        self._terms: Dict[int, Tuple[str, ...]] = {}
+        self._ids: Dict[str, int] = {}
+        self._next = 0
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Document], ids: Sequence[str]) -> "BM25Index":
+        index = cls()
+        index.add(documents, ids)
+        return index
+
+    def add(self, documents: Iterable[Document], ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc, doc_id in zip(documents, ids):
+                if doc_id in self._ids:
+                    continue
+                counts = Counter(tokenize(doc.page_content))
+                slot = self._next
+                self._next += 1
+                self._ids[doc_id] = slot
+                self._docs[slot] = doc
+                length = sum(counts.values())
+                self._lengths[slot] = length
+                self._terms[slot] = tuple(counts)
+                self._total_length += length
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[slot] = tf
+                self._count_facets(doc, 1)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                slot = self._ids.pop(doc_id, None)
+                if slot is None:
+                    continue
+                for term in self._terms.pop(slot):
+                    postings = self._postings[term]
+                    del postings[slot]
+                    if not postings:
+                        del self._postings[term]
+                self._total_length -= self._lengths.pop(slot)
+                self._count_facets(self._docs.pop(slot), -1)
+
+    def _count_facets(self, doc: Document, delta: int) -> None:
+        for field in self.facets:
+            value = doc.metadata.get(field)
+            if value is None:
+                continue
+            counts = self._facet_counts[field]
+            counts[value] += delta
+            if counts[value] <= 0:
+                del counts[value]
+
+    def facet(self, field: str) -> Dict[str, int]:
+        """Number of indexed chunks per value of a metadata field"""
+        with self._lock:
+            return dict(self._facet_counts.get(field, {}))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """Return the top k (document, score) pairs for a query"""
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            average_length = self._total_length / n
+            scores: Dict[int, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for slot, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[slot] / average_length)
+                    scores[slot] = scores.get(slot, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            if filter:
+                scores = {s: v for s, v in scores.items() if _matches(self._docs[s].metadata, filter)}
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._docs[slot], score) for slot, score in top]
+
+
+def fused_scores(result_lists: Sequence[Sequence[Document]], k: int = 60) -> List[Tuple[Document, float]]:
+    """Merge ranked lists, scoring each document by the sum of 1 / (k + rank), best first"""
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc.page_content
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return [(docs[key], scores[key]) for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[Sequence[Document]], k: int = 60) -> List[Document]:
+    return [doc for doc, _ in fused_scores(result_lists, k)]
+
+
+class HybridRetriever:
+    """
+    Dense + BM25 retrieval fused with reciprocal rank fusion.
+
+    The vector search runs on a worker thread while BM25 answers in-process.
+    If the embedding provider is slower than dense_timeout or failing, the
+    lexical results are returned alone and dense search is skipped for
+    cooldown seconds.
+
+    With a router, questions about one kind of material (e.g. grading) only
+    search the chunks of that material_type, falling back to the whole set
+    when the routed search finds nothing.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        lexical_index: Optional[BM25Index],
+        k: int = 4,
+        candidates: int = 10,
+        dense_timeout: float = 3.0,
+        cooldown: float = 30.0,
+        router=None,
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.router = router
+        self.k = k
+        self.candidates = candidates
+        self.dense_timeout = dense_timeout
+        self.cooldown = cooldown
+        self._dense_disabled_until = 0.0
+
+    def _start_dense(self, query: str, filter: Optional[Dict]):
+        if time.monotonic() < self._dense_disabled_until:
+            return None
+        return _executor.submit(self.vector_store.similarity_search, query, self.candidates, filter=filter)
+
+    def _finish_dense(self, future) -> Optional[List[Document]]:
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=self.dense_timeout)
+        except (FutureTimeoutError, Exception) as e:
+            logger.warning("Dense retrieval unavailable (%s); using lexical results only", e or "timeout")
+            self._dense_disabled_until = time.monotonic() + self.cooldown
+            return None
+
+    def search(self, query: str, filter: Optional[Dict] = None) -> List[Document]:
+        if self.lexical_index is None:
+            return self.vector_store.similarity_search(query, self.k, filter=filter)
+
+        started = time.monotonic()
+        # Dense search (a remote embedding call) runs while BM25 scores locally
+        future = self._start_dense(query, filter)
+        lexical = [doc for doc, _ in self.lexical_index.search(query, self.candidates, filter=filter)]
+        lexical_seconds = time.monotonic() - started
+        dense = self._finish_dense(future)
+        logger.info(
+            "hybrid retrieval lexical=%.1fms dense=%s total=%.0fms",
+            lexical_seconds * 1000,
+            "skipped" if dense is None else f"{len(dense)} docs",
+            (time.monotonic() - started) * 1000,
+        )
+        if dense is None:
+            return lexical[:self.k]
+        return reciprocal_rank_fusion([dense, lexical])[:self.k]
+
+    def route(self, query: str) -> Optional[Dict]:
+        """Metadata filter for the query, if the router narrows it"""
+        if self.router is None or self.lexical_index is None:
+            return None
+        return self.router.route(query, self.lexical_index.facet("material_type"))
+
+    def invoke(self, query: str) -> List[Document]:
+        filter = self.route(query)
+        if filter is not None:
+            docs = self.search(query, filter=filter)
+            logger.info("routed retrieval filter=%s docs=%d", filter, len(docs))
+            if docs:
+                return docs
+        return self.search(query)
+
+    async def ainvoke(self, query: str) -> List[Document]:
+        return await asyncio.to_thread(self.invoke, query)
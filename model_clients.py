@@ -0,0 +1,158 @@
+"""
+Process-wide model clients, prompt templates and chain skeletons.
+
+Everything here is built once per process and shared by every session, so
+a new session only pays for its own history and attached documents. The
+shared ChatAnthropic and embedding clients also reuse one HTTP connection
+pool each instead of opening one per student.
+"""
+import os
+from functools import lru_cache
+from typing import Optional
+
+import streamlit as st
+from langchain_anthropic import ChatAnthropic
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+from history_window import HistoryCompactor
+from response_cache import SemanticResponseCache
+
+
+def get_secret(*names: str, default: Optional[str] = None) -> Optional[str]:
+    """Look up a secret in st.secrets first, then env vars, outside Streamlit too"""
+    for name in names:
+        try:
+            value = st.secrets.get(name)
+        except Exception:
+            # No secrets.toml, e.g. when served by the API instead of Streamlit
+            value = None
+        value = value or os.getenv(name)
+        if value:
+            return value
+    return default
+
+
+@lru_cache(maxsize=None)
+def configure_tracing() -> None:
+    """Enable LangSmith tracing once per process if a key is configured"""
+    langchain_key = get_secret("LANGCHAIN_API_KEY")
+    if langchain_key:
+        os.environ["LANGCHAIN_TRACING_V2"] = "true"
+        os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
+        os.environ["LANGCHAIN_API_KEY"] = langchain_key
+
+
+@lru_cache(maxsize=None)
+def get_llm() -> ChatAnthropic:
+    """Shared chat model; raises KeyError when no Anthropic key is configured"""
+    anthropic_key = get_secret("ANTHROPIC_API_KEY", "ANTHROPIC_KEY")
+    if not anthropic_key:
+        raise KeyError("ANTHROPIC_API_KEY not found")
+    return ChatAnthropic(
+        model="claude-sonnet-4-20250514",
+        anthropic_api_key=anthropic_key,
+        temperature=0.7,
+        streaming=True,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_file_parser():
+    """Shared FileParser, and with it the embedding client and document registry"""
+    # Imported here so the API can inject its own parser without loading it
+    from file_parser import FileParser
+    from embedding_backends import get_backend
+
+    # EMBEDDING_BACKEND picks the backend, e.g. "google" or "local-hash"
+    backend = get_secret("EMBEDDING_BACKEND", default="google")
+    api_key = get_secret(*get_backend(backend).secret_names, default="")
+    return FileParser(api_key, embedding_backend=backend)
+
+
+@lru_cache(maxsize=None)
+def get_ingestion_jobs():
+    """Background ingestion shared by every session, capped at INGESTION_CONCURRENCY jobs"""
+    from ingestion_jobs import IngestionJobManager
+
+    max_concurrent = int(get_secret("INGESTION_CONCURRENCY", default="2"))
+    return IngestionJobManager(get_file_parser(), max_concurrent=max_concurrent)
+
+
+@lru_cache(maxsize=None)
+def load_prompt(name: str) -> str:
+    with open(os.path.join("prompts", name), "r") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def default_template() -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        ("system", load_prompt("mentor_prompt.txt")),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ])
+
+
+@lru_cache(maxsize=None)
+def retriever_template() -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        ("system", load_prompt("retriever_prompt.txt")),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ])
+
+
+@lru_cache(maxsize=None)
+def mentor_template() -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages([
+        ("system", load_prompt("mentor_prompt.txt")),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+        ("system", "Context: {context}")
+    ])
+
+
+def build_default_runnable(llm):
+    """Prompt -> model -> text for the conversation without uploaded context"""
+    # Ends in plain strings like the document chain, so both chains stream str
+    return (
+        (lambda x: {"input": x["input"], "context": "", "chat_history": x["chat_history"]}) |
+        default_template() |
+        llm |
+        StrOutputParser()
+    )
+
+
+def build_document_chain(llm):
+    """Stuff retrieved documents into the mentor prompt"""
+    return create_stuff_documents_chain(
+        llm=llm,
+        prompt=mentor_template(),
+        document_variable_name="context"
+    )
+
+
+@lru_cache(maxsize=None)
+def get_history_compactor():
+    """Shared history compactor, summarizing with the shared model"""
+    return HistoryCompactor(get_llm())
+
+
+@lru_cache(maxsize=None)
+def shared_default_runnable():
+    return build_default_runnable(get_llm())
+
+
+@lru_cache(maxsize=None)
+def shared_document_chain():
+    return build_document_chain(get_llm())
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    """Semantic answer cache, enabled by setting RESPONSE_CACHE=1"""
+    if str(get_secret("RESPONSE_CACHE", default="0")).lower() not in ("1", "true", "yes"):
+        return None
+    return SemanticResponseCache(get_file_parser().embeddings)
@@ -0,0 +1,125 @@
+import atexit
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+from pypdf import PdfReader
+
+
+# Below this many pages the process pool costs more than it saves
+PARALLEL_MIN_PAGES = 16
+SHARD_SIZE = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Per worker process: recently opened documents, by the token of the call
+_worker_readers: "OrderedDict[str, PdfReader]" = OrderedDict()
+
+
+def pdf_bytes(source) -> bytes:
+    """Return the raw bytes of a PDF given bytes, a path or an uploaded file"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+
+def _shared_pool() -> ProcessPoolExecutor:
+    """
+    Process-wide extraction pool, started on first use and shut down at exit.
+
+    Workers come from forkserver (spawn where that is unavailable) rather
+    than fork: callers run on ingestion threads, and forking a
+    multithreaded process can deadlock the child.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=context)
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_range(path: str, token: str, start: int, stop: int, mode: str) -> List[str]:
+    # Each worker parses a document once and reuses it for every shard it gets
+    reader = _worker_readers.get(token)
+    if reader is None:
+        reader = _worker_readers[token] = PdfReader(path)
+        while len(_worker_readers) > 2:
+            _worker_readers.popitem(last=False)
+    return [reader.pages[i].extract_text(extraction_mode=mode) for i in range(start, stop)]
+
+
+def page_count(data: bytes) -> int:
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+def iter_page_text(
+    source,
+    workers: Optional[int] = None,
+    mode: str = "layout",
+    start: int = 0,
+) -> Iterator[str]:
+    """
+    Yield the text of each PDF page, in order.
+
+    Large documents are sharded into small page ranges across the shared
+    process pool, at most workers shards in flight, so callers can start
+    working on the first pages while later ones are still being extracted.
+    """
+    data = pdf_bytes(source)
+    reader = PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or total - start < PARALLEL_MIN_PAGES:
+        for i in range(start, total):
+            yield reader.pages[i].extract_text(extraction_mode=mode)
+        return
+
+    # Workers read the document from disk instead of receiving it with every shard
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    token = uuid.uuid4().hex
+    pool = _shared_pool()
+    ranges = iter([(s, min(s + SHARD_SIZE, total)) for s in range(start, total, SHARD_SIZE)])
+    pending = deque()
+    try:
+        for s, e in ranges:
+            pending.append(pool.submit(_extract_range, path, token, s, e, mode))
+            if len(pending) >= workers:
+                break
+        while pending:
+            texts = pending.popleft().result()
+            for s, e in ranges:
+                pending.append(pool.submit(_extract_range, path, token, s, e, mode))
+                break
+            yield from texts
+    finally:
+        # Don't run remaining shards if the consumer stopped early
+        for future in pending:
+            future.cancel()
+        os.unlink(path)
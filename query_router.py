@@ -0,0 +1,50 @@
+import re
+from typing import Collection, Dict, Optional, Pattern
+
+
+# Query wording that points at one kind of course material. Only phrases
+# that rarely mean anything else: "point", "score", "weight", "requirements"
+# or "edge cases" come up in ordinary concept questions too.
+DEFAULT_ROUTES: Dict[str, Pattern] = {
+    "rubric": re.compile(
+        r"\b(rubric|grading|graded|grading criteria|partial credit|full credit|deduct(ed|ion|ions)?|"
+        r"how many points|points? (off|deducted|worth)|worth( \d+)? points?|point breakdown)\b",
+        re.IGNORECASE,
+    ),
+    "test_cases": re.compile(
+        r"\b(test ?cases?|unit tests?|failing tests?|autograder|expected output|"
+        r"assert\w*|pytest)\b",
+        re.IGNORECASE,
+    ),
+    "assignment": re.compile(
+        r"\b(due (date|by|on|at)|when is .{0,40}\bdue|deadline|submit\w*|submission|deliverables?|"
+        r"late (days?|policy)|starter code)\b",
+        re.IGNORECASE,
+    ),
+}
+
+
+class QueryRouter:
+    """
+    Maps a question to a metadata filter on the chunks' material_type.
+
+    A route only applies when exactly one material type matches the
+    question and the session's documents mix that type with others,
+    otherwise the search stays unfiltered.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Pattern]] = None):
+        self.routes = routes or DEFAULT_ROUTES
+
+    def route(self, query: str, available_types: Collection[str]) -> Optional[Dict[str, str]]:
+        # With a single material type a filter can't narrow anything
+        if len(available_types) < 2:
+            return None
+        matched = [
+            material_type
+            for material_type, pattern in self.routes.items()
+            if material_type in available_types and pattern.search(query)
+        ]
+        if len(matched) != 1:
+            return None
+        return {"material_type": matched[0]}
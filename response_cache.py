@@ -0,0 +1,149 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from typing import Dict, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase and collapse whitespace/trailing punctuation so trivial variants match"""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+
+class CacheEntry:
+    __slots__ = ("document_set", "question", "vector", "answer", "created_at", "generation_seconds")
+
+    def __init__(self, document_set, question, vector, answer, generation_seconds):
+        self.document_set = document_set
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.created_at = time.time()
+        self.generation_seconds = generation_seconds
+
+
+class SemanticResponseCache:
+    """
+    Answers to history-independent questions, keyed by (document set, question embedding).
+
+    A lookup first tries an exact match on the normalized question, then the
+    most similar cached question for the same document set whose cosine
+    similarity is at least threshold. Entries expire after ttl seconds and
+    the least recently used are evicted beyond max_entries. Question vectors
+    computed by a lookup are kept briefly so storing the answer afterwards
+    doesn't embed the question again.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.95,
+        ttl: float = 24 * 3600,
+        max_entries: int = 5000,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._ids = count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        # Recently embedded questions: a miss is usually followed by a store
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+    def _embed(self, question: str) -> np.ndarray:
+        with self._lock:
+            vector = self._vectors.get(question)
+        if vector is not None:
+            return vector
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        with self._lock:
+            self._vectors[question] = vector
+            while len(self._vectors) > 1024:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for entry_id in [i for i, e in self._entries.items() if e.created_at < cutoff]:
+            del self._entries[entry_id]
+
+    def _candidates(self, document_set: str):
+        return [(i, e) for i, e in self._entries.items() if e.document_set == document_set]
+
+    def lookup(self, document_set: str, question: str) -> Optional[str]:
+        """Return a cached answer for a similar question, or None"""
+        started = time.monotonic()
+        normalized = normalize_question(question)
+
+        with self._lock:
+            self._expire()
+            candidates = self._candidates(document_set)
+            match = next((i for i, e in candidates if e.question == normalized), None)
+
+        if match is None and candidates:
+            vector = self._embed(normalized)
+            matrix = np.stack([e.vector for _, e in candidates])
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                match = candidates[best][0]
+
+        with self._lock:
+            entry = self._entries.get(match) if match is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            self.hits += 1
+            saved = max(0.0, entry.generation_seconds - (time.monotonic() - started))
+            self.seconds_saved += saved
+
+        logger.info("Response cache hit for %r (saved ~%.2fs)", question, saved)
+        return entry.answer
+
+    def store(self, document_set: str, question: str, answer: str, generation_seconds: float) -> None:
+        normalized = normalize_question(question)
+        entry = CacheEntry(document_set, normalized, self._embed(normalized), answer, generation_seconds)
+        with self._lock:
+            self._vectors.pop(normalized, None)
+            self._entries[next(self._ids)] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def store_in_background(self, document_set: str, question: str, answer: str, generation_seconds: float) -> None:
+        """Store off the caller's thread, so a finished answer isn't held up by an embedding call"""
+        def run():
+            try:
+                self.store(document_set, question, answer, generation_seconds)
+            except Exception as e:
+                logger.warning("Response cache store failed: %s", e)
+
+        self._executor.submit(run)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "seconds_saved": self.seconds_saved,
+            }
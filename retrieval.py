@@ -2,45 +2,166 @@ __import__('pysqlite3')
 import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
-from langchain_chroma import Chroma
-from langchain_voyageai import VoyageAIEmbeddings
-from chromadb.config import DEFAULT_TENANT, DEFAULT_DATABASE, Settings
-import chromadb
-
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from langchain_chroma import Chroma
-from langchain_voyageai import VoyageAIEmbeddings
-from chromadb.config import DEFAULT_TENANT, DEFAULT_DATABASE, Settings
-import chromadb
+from langchain_core.documents import Document
 import dotenv
 import streamlit as st
+from document_registry import CHROMA_PATH, chroma_client
+from embedding_backends import build_embeddings
 
 
 # load VoyageAI key
 dotenv.load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "umich_fa2024"
+
 class MyEmbeddings:
         def __init__(self, model):
             self.model = model
         def embed_documents(self):
             return 0
-        
+
         def embed_query(self, query):
             return list([0]*1024)
-        
+
+
+class RetrievalResult:
+    """Documents and relevance scores for one query of a batch, with its timings"""
+
+    __slots__ = ("query", "documents", "embed_seconds", "search_seconds")
+
+    def __init__(
+        self,
+        query: str,
+        documents: List[Tuple[Document, float]],
+        embed_seconds: float,
+        search_seconds: float,
+    ):
+        self.query = query
+        self.documents = documents
+        self.embed_seconds = embed_seconds
+        self.search_seconds = search_seconds
+
+    def as_dict(self) -> Dict:
+        return {
+            "query": self.query,
+            "documents": len(self.documents),
+            "embed_ms": self.embed_seconds * 1000,
+            "search_ms": self.search_seconds * 1000,
+        }
+
 
 class Retriever:
-    def __init__(self, model: str = "voyage-2") -> None:
-        new_client = chromadb.PersistentClient(path = "./chroma_db", tenant = DEFAULT_TENANT, database = DEFAULT_DATABASE, settings = Settings())
+    """
+    Retriever over the persistent course corpus.
+
+    Use Retriever.instance() rather than constructing it: the Chroma client,
+    the embedding client and the collection wrappers are created once per
+    process and shared by every caller.
+    """
+
+    _instance: Optional["Retriever"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        model: str = "voyage-2",
+        embeddings=None,
+        collection_name: str = COLLECTION_NAME,
+        k: int = 10,
+        score_threshold: float = 0.5,
+        max_workers: int = 8,
+    ) -> None:
+        client = chroma_client(CHROMA_PATH)
+
+        if embeddings is None:
+            embeddings = build_embeddings("voyage", api_key=st.secrets["VOYAGEAI_KEY"])
+        self.embeddings = embeddings
+        self.k = k
+        self.score_threshold = score_threshold
 
-        embeddings = VoyageAIEmbeddings(
-            voyage_api_key=st.secrets["VOYAGEAI_KEY"] , model="voyage-large-2-instruct")
-        
         dummyEmbeddings = MyEmbeddings(model="dummy")
 
-        saved_data_store = Chroma(persist_directory="./chroma_db", collection_name="umich_fa2024", embedding_function=embeddings, client=new_client)
-        saved_data_store_dummy = Chroma(persist_directory="./chroma_db", collection_name="umich_fa2024", embedding_function=dummyEmbeddings, client=new_client)
+        self.store = Chroma(collection_name=collection_name, embedding_function=embeddings, client=client)
+        saved_data_store_dummy = Chroma(collection_name=collection_name, embedding_function=dummyEmbeddings, client=client)
 
-        self.retriver_sim = saved_data_store.as_retriever(search_type="similarity_score_threshold", search_kwargs={"k": 10, "score_threshold": 0.5})
+        self.retriver_sim = self.store.as_retriever(search_type="similarity_score_threshold", search_kwargs={"k": k, "score_threshold": score_threshold})
         self.retriever_dummy = saved_data_store_dummy.as_retriever(search_type="similarity_score_threshold", search_kwargs={"k": 1, "score_threshold": 0.99})
 
+        # Chroma returns distances; the LangChain retrievers threshold on relevance
+        self._relevance = self.store._select_relevance_score_fn()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="retriever")
+
+    @classmethod
+    def instance(cls) -> "Retriever":
+        """The process-wide retriever, created on first use"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        # As queries, not documents: providers like Voyage embed queries with
+        # their own input type, and the embedding cache only keeps documents
+        if len(queries) == 1:
+            return [self.embeddings.embed_query(queries[0])]
+        # One batched request (and one rate-limit token) where the client has it
+        embed_queries = getattr(self.embeddings, "embed_queries", None)
+        if embed_queries is not None:
+            return embed_queries(queries)
+        return list(self._executor.map(self.embeddings.embed_query, queries))
+
+    def _search(self, vector: List[float], k: int, filter: Optional[Dict]) -> Tuple[List[Tuple[Document, float]], float]:
+        started = time.monotonic()
+        results = self.store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filter)
+        scored = [(doc, self._relevance(distance)) for doc, distance in results]
+        documents = [(doc, score) for doc, score in scored if score >= self.score_threshold]
+        return documents, time.monotonic() - started
+
+    def retrieve(self, query: str, k: Optional[int] = None, filter: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        return self.retrieve_many([query], k=k, filter=filter)[0].documents
+
+    def retrieve_many(
+        self,
+        queries: Sequence[str],
+        k: Optional[int] = None,
+        filter: Optional[Dict] = None,
+    ) -> List[RetrievalResult]:
+        """
+        Retrieve for several queries at once, e.g. multi-query expansion or evaluation runs.
+
+        The queries are embedded concurrently, exactly as a single query
+        would be, and the vector searches then run concurrently. Results are
+        in the order of the queries.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        k = k or self.k
+
+        started = time.monotonic()
+        vectors = self._embed_queries(queries)
+        embed_seconds = time.monotonic() - started
+
+        futures = [self._executor.submit(self._search, vector, k, filter) for vector in vectors]
+        results = []
+        for query, future in zip(queries, futures):
+            documents, search_seconds = future.result()
+            results.append(RetrievalResult(query, documents, embed_seconds, search_seconds))
+
+        logger.info(
+            "retrieve_many queries=%d embed=%.0fms total=%.0fms",
+            len(queries),
+            embed_seconds * 1000,
+            (time.monotonic() - started) * 1000,
+        )
+        return results
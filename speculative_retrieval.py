@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+
+logger = logging.getLogger(__name__)
+
+# Words that usually point back at earlier turns ("why does it fail?")
+FOLLOW_UP_TERMS = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|above|previous|earlier|"
+    r"same|again|another|instead|else|also|more|what about|how about)\b",
+    re.IGNORECASE,
+)
+# Quiz answers sent from the option buttons, e.g. "B) a hash table"
+OPTION_ANSWER = re.compile(r"^\s*[A-D]\)")
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="speculative-retrieval")
+
+
+def is_self_contained(query: str, chat_history: List) -> bool:
+    """Heuristic: can this query be searched as-is without rewriting it?"""
+    if not chat_history:
+        return True
+    if OPTION_ANSWER.match(query):
+        return False
+    if len(query.split()) < 4:
+        return False
+    return FOLLOW_UP_TERMS.search(query) is None
+
+
+WORD = re.compile(r"\w+")
+
+
+def nearly_identical(query: str, rewritten: str, threshold: float = 0.8) -> bool:
+    """Whether a rewrite shares almost all of its words with the original query"""
+    a, b = set(WORD.findall(query.lower())), set(WORD.findall(rewritten.lower()))
+    if not a or not b:
+        return not b
+    return len(a & b) / len(a | b) >= threshold
+
+
+def merge_documents(primary: List[Document], secondary: List[Document], k: int) -> List[Document]:
+    """Primary results first, then unseen secondary ones, up to k documents"""
+    merged, seen = [], set()
+    for doc in primary + secondary:
+        if doc.page_content in seen:
+            continue
+        seen.add(doc.page_content)
+        merged.append(doc)
+        if len(merged) >= k:
+            break
+    return merged
+
+
+class SpeculativeRetriever:
+    """
+    History-aware retrieval that doesn't wait for the query rewrite to start searching.
+
+    Searches with the raw input at the same moment the LLM starts rewriting
+    it into a standalone query. The raw results are returned on their own
+    when the input already looks self-contained or the rewrite barely
+    changes it; otherwise the rewritten query's results are merged in front
+    of them.
+
+    rewrite_timeout (off by default) bounds the wait for the rewrite; past
+    it the raw results are used, though the LLM call still runs to the end.
+    """
+
+    def __init__(self, retriever, llm, prompt, k: int = 4, rewrite_timeout: Optional[float] = None):
+        self.retriever = retriever
+        self.rewrite_chain = prompt | llm | StrOutputParser()
+        self.k = k
+        self.rewrite_timeout = rewrite_timeout
+        # Running averages of stage costs, for estimating what a skip saved
+        self._costs: Dict[str, float] = {}
+
+    def _observe(self, stage: str, seconds: float) -> None:
+        previous = self._costs.get(stage)
+        self._costs[stage] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+    def _log(self, timings: Dict[str, float], outcome: str, skipped: float = 0.0) -> None:
+        # skipped: estimated cost of the rewrite and/or search we didn't wait for
+        timings["saved"] = skipped
+        logger.info(
+            "retrieval %s: %s",
+            outcome,
+            " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items()),
+        )
+
+    def _timed(self, fn, *args):
+        started = time.monotonic()
+        result = fn(*args)
+        return result, time.monotonic() - started
+
+    def _rewrite(self, inputs: Dict, config: Optional[RunnableConfig]) -> str:
+        rewritten, seconds = self._timed(self.rewrite_chain.invoke, inputs, config)
+        # Also recorded for rewrites nobody waited for, so estimates stay honest
+        self._observe("rewrite", seconds)
+        return rewritten
+
+    def _search(self, query: str) -> List[Document]:
+        docs, seconds = self._timed(self.retriever.invoke, query)
+        self._observe("search", seconds)
+        return docs
+
+    def invoke(self, x: Dict, config: Optional[RunnableConfig] = None) -> List[Document]:
+        started = time.monotonic()
+        query = x["input"]
+        chat_history = x.get("chat_history", [])
+        timings: Dict[str, float] = {}
+
+        if is_self_contained(query, chat_history):
+            docs = self._search(query)
+            timings["total"] = time.monotonic() - started
+            self._log(timings, "self-contained", self._costs.get("rewrite", 0.0))
+            return docs
+
+        rewrite = _executor.submit(self._rewrite, {"input": query, "chat_history": chat_history}, config)
+        raw_docs = self._search(query)
+        timings["raw_search"] = time.monotonic() - started
+        timeout = None if self.rewrite_timeout is None else max(0.0, self.rewrite_timeout - timings["raw_search"])
+        try:
+            rewritten = rewrite.result(timeout=timeout)
+        except FutureTimeout:
+            # The rewrite finishes in the background; answer from the raw search
+            timings["total"] = time.monotonic() - started
+            estimate = self._costs.get("rewrite", self.rewrite_timeout) + self._costs.get("search", 0.0)
+            self._log(timings, "rewrite timed out", max(0.0, estimate - timings["total"]))
+            return raw_docs
+        timings["rewrite"] = time.monotonic() - started
+
+        if nearly_identical(query, rewritten):
+            timings["total"] = time.monotonic() - started
+            self._log(timings, "rewrite unchanged", self._costs.get("search", 0.0))
+            return raw_docs
+
+        rewritten_docs = self._search(rewritten)
+        timings["total"] = time.monotonic() - started
+        timings["rewritten_search"] = timings["total"] - timings["rewrite"]
+        # The raw search overlapped the rewrite, so there is nothing to claim
+        self._log(timings, "rewritten")
+        return merge_documents(rewritten_docs, raw_docs, self.k)
+
+    async def ainvoke(self, x: Dict, config: Optional[RunnableConfig] = None) -> List[Document]:
+        started = time.monotonic()
+        query = x["input"]
+        chat_history = x.get("chat_history", [])
+
+        if is_self_contained(query, chat_history):
+            return await self.retriever.ainvoke(query)
+
+        rewrite = asyncio.ensure_future(
+            self.rewrite_chain.ainvoke({"input": query, "chat_history": chat_history}, config)
+        )
+        raw_docs = await self.retriever.ainvoke(query)
+        remaining = None
+        if self.rewrite_timeout is not None:
+            remaining = max(0.0, self.rewrite_timeout - (time.monotonic() - started))
+        done, _ = await asyncio.wait({rewrite}, timeout=remaining)
+        if not done:
+            rewrite.cancel()
+            logger.info("retrieval rewrite timed out: total=%.0fms", (time.monotonic() - started) * 1000)
+            return raw_docs
+        rewritten = rewrite.result()
+        if nearly_identical(query, rewritten):
+            return raw_docs
+
+        rewritten_docs = await self.retriever.ainvoke(rewritten)
+        logger.info("retrieval rewritten: total=%.0fms", (time.monotonic() - started) * 1000)
+        return merge_documents(rewritten_docs, raw_docs, self.k)
+
+    def as_runnable(self) -> RunnableLambda:
+        return RunnableLambda(self.invoke, afunc=self.ainvoke)
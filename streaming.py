@@ -0,0 +1,104 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class StreamStats:
+    """Time to first token and throughput of one streamed response"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.tokens = 0
+        self.chars = 0
+        self.updates = 0
+
+    def record(self, text: str) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        self.tokens += 1
+        self.chars += len(text)
+
+    def finish(self) -> "StreamStats":
+        self.finished_at = time.monotonic()
+        return self
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        # Throughput once tokens are flowing, excluding the wait for the first
+        if self.first_token_at is None:
+            return None
+        elapsed = (self.finished_at or time.monotonic()) - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else None
+
+    def as_dict(self) -> Dict:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens_per_second": self.tokens_per_second,
+            "total_seconds": (self.finished_at or time.monotonic()) - self.started,
+            "tokens": self.tokens,
+            "chars": self.chars,
+            "ui_updates": self.updates,
+        }
+
+
+class CoalescingWriter:
+    """
+    Batches streamed text into UI updates.
+
+    Tokens are appended to a buffer and the sink only sees the accumulated
+    text every interval seconds or once max_chars have piled up, instead of
+    a full re-render per token. The first token is shown immediately so the
+    response still appears as soon as it starts.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[str], None],
+        interval: float = 0.08,
+        max_chars: int = 400,
+        cursor: str = "▌",
+    ):
+        self.sink = sink
+        self.interval = interval
+        self.max_chars = max_chars
+        self.cursor = cursor
+        self.stats = StreamStats()
+        self._text = ""
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._last_flush = 0.0
+
+    @property
+    def text(self) -> str:
+        return self._text + "".join(self._pending)
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        self.stats.record(text)
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if (
+            self._pending_chars >= self.max_chars
+            or time.monotonic() - self._last_flush >= self.interval
+        ):
+            self._flush(self.cursor)
+
+    def _flush(self, suffix: str) -> None:
+        self._text += "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        self.stats.updates += 1
+        self.sink(self._text + suffix)
+
+    def close(self) -> str:
+        """Render the final text without the cursor and return it"""
+        self._flush("")
+        self.stats.finish()
+        return self._text
@@ -0,0 +1,64 @@
+from audit_compact import check_fidelity, compact_audit, compact_checked
+from audit_parse import parse_audit_pages
+
+
+PAGES = [
+    "Student Name: Jordan Lee\n"
+    "Cumulative GPA: 3.512\n"
+    "Expected Graduation: WN 2026\n"
+    "Credits Toward Program: 98\n"
+    "In Progress Units: 8\n"
+    "\n"
+    "Satisfied: Upper Level Writing\n"
+    "FA 2023  ENGLISH 325  Art of the Essay  4.00  A-\n"
+    "NO   Major Electives - 7 credits needed\n"
+    "WN 2024  EECS 281  Data Struc & Algorithms  4.00  B+\n",
+    # Requirements and their courses carry over page breaks
+    "FA 2024  EECS 370  Intro Computer Org  4.00  IP\n"
+    "In Progress: Capstone Design\n"
+    "FA 2024  EECS 441  Mobile App Development  4.00 *\n",
+]
+
+DENSE = [
+    "Name: Jordan Lee | GPA: 3.512 | Grad: WN 2026 | CTP: 98 | IP units: 8",
+    "[DONE] Upper Level Writing (4cr used): ENGLISH 325 4cr A-",
+    "[IP] Major Electives (8cr used, need 7 credits): EECS 281 4cr B+; EECS 370 4cr IP",
+    "[IP] Capstone Design (4cr used): EECS 441 4cr IP",
+    "In progress: EECS 370 (4cr), EECS 441 (4cr)",
+]
+
+
+def test_dense_lines():
+    audit = parse_audit_pages(iter(PAGES))
+    assert compact_audit(audit).splitlines() == DENSE
+
+
+def test_compact_form_keeps_everything():
+    audit = parse_audit_pages(iter(PAGES))
+    result = compact_checked(audit)
+    assert result.missing == []
+    assert result.text == "\n".join(DENSE)
+    assert result.tokens_after < result.tokens_before
+
+
+def test_unrecognized_layout_falls_back_to_text():
+    pages = ["Degree Progress Report\n", "Something the parser has never seen\n"]
+    audit = parse_audit_pages(iter(pages))
+    assert not audit.recognized
+    assert compact_audit(audit) == "".join(pages)
+    assert compact_checked(audit).text == "".join(pages)
+
+
+def test_dropped_course_codes_fall_back_to_text():
+    pages = [PAGES[0] + "Note: EECS 203 or MATH 465 must be completed first\n", PAGES[1]]
+    audit = parse_audit_pages(iter(pages))
+    result = compact_checked(audit)
+    assert result.missing == ["EECS 203", "MATH 465"]
+    assert result.text == "".join(pages)
+
+
+def test_dropped_requirement_line_is_reported():
+    pages = [PAGES[0] + "Needed: 2 courses from Group B\n", PAGES[1]]
+    audit = parse_audit_pages(iter(pages))
+    assert check_fidelity(audit.text, compact_audit(audit)) == ["Needed: 2 courses from Group B"]
+    assert compact_checked(audit).text == "".join(pages)
@@ -0,0 +1,72 @@
+import re
+from typing import List, Tuple
+
+
+OPTIONS_PATTERN = re.compile(r'\[OPTIONS\](.*?)\[/OPTIONS\]', re.DOTALL | re.IGNORECASE)
+# Match A) ... B) ... patterns, in both newline and inline formats
+OPTION_PATTERN = re.compile(r'([A-D])\)\s*([^A-D]+?)(?=(?:\s*[A-D]\)|$))', re.DOTALL)
+
+
+def parse_options(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Parse [OPTIONS]...[/OPTIONS] block from response - get the LAST one"""
+    matches = list(OPTIONS_PATTERN.finditer(text))
+    if not matches:
+        return text, []
+
+    # Use the last OPTIONS block (most recent question)
+    options_text = matches[-1].group(1).strip()
+    options = [(letter, option.strip()) for letter, option in OPTION_PATTERN.findall(options_text)]
+
+    # Remove ALL options blocks from the message
+    message_without_options = OPTIONS_PATTERN.sub('', text).strip()
+    return message_without_options, options
+
+
+class Message:
+    """A chat message, with its quiz options parsed once when it is added"""
+
+    __slots__ = ("role", "content", "text", "options")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        if role == "assistant":
+            self.text, self.options = parse_options(content)
+        else:
+            self.text, self.options = content, []
+
+
+class Transcript:
+    """
+    The messages of one chat, rendered a window at a time.
+
+    Only the newest visible messages are drawn on each rerun, so the cost
+    of a rerun depends on the window size rather than the session length.
+    Older messages are paged in on request.
+    """
+
+    def __init__(self, page_size: int = 20):
+        self.page_size = page_size
+        self.messages: List[Message] = []
+        self.visible = page_size
+
+    def append(self, role: str, content: str) -> Message:
+        message = Message(role, content)
+        self.messages.append(message)
+        return message
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    @property
+    def hidden(self) -> int:
+        """Number of older messages outside the window"""
+        return max(0, len(self.messages) - self.visible)
+
+    def show_earlier(self) -> None:
+        self.visible += self.page_size
+
+    def window(self) -> List[Tuple[int, Message]]:
+        """The visible messages with their indexes in the transcript, oldest first"""
+        start = self.hidden
+        return list(enumerate(self.messages[start:], start))